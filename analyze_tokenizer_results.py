@@ -1,8 +1,7 @@
 
-import sentencepiece as spm
-from tokenizers import Tokenizer
 import json
 import os
+import tokenizer_registry
 
 def analyze_tokenizers():
     sample_text = "ഡിജിറ്റൽ ഇന്ത്യയുടെ ഭാഗമായി 75000 കോടി രൂപ നിക്ഷേപിക്കുമെന്ന് ഗൂഗിള്‍ കഴിഞ്ഞ ദിവസം പ്രഖ്യാപിച്ചിരുന്നു."
@@ -20,7 +19,7 @@ def analyze_tokenizers():
     for name, path in bpe_models.items():
         if os.path.exists(path):
             try:
-                tokenizer = Tokenizer.from_file(path)
+                tokenizer = tokenizer_registry.load_path(path)
                 encoded = tokenizer.encode(sample_text)
                 print(f"\n{name} BPE Model:")
                 print(f"Tokens: {encoded.tokens}")
@@ -42,7 +41,7 @@ def analyze_tokenizers():
     for name, path in sp_models.items():
         if os.path.exists(path):
             try:
-                sp = spm.SentencePieceProcessor(model_file=path)
+                sp = tokenizer_registry.load_path(path)
                 tokens = sp.encode(sample_text, out_type=str)
                 print(f"\n{name} SentencePiece Model:")
                 print(f"Tokens: {tokens}")
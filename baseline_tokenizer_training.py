@@ -1,14 +1,29 @@
+import argparse
+import hashlib
 import os
 import json
-from collections import defaultdict
+import random
+import shutil
+import tempfile
+import time
+import multiprocessing as mp
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from multiprocessing.connection import wait
 from pathlib import Path
+from corpus_filter import iter_line_blocks, morph_mask, raw_mask, score_lines
+from corpus_stream import new_stats, segment_line
+from enhanced_segmenter import MalayalamMorphologicalSegmenter
+import instrumentation
 
 # Import tokenizers library
 try:
     from tokenizers import Tokenizer, models, trainers, pre_tokenizers, normalizers
+    from tokenizers import __version__ as tokenizers_version
     from tokenizers.processors import TemplateProcessing
     HAS_HF = True
 except ImportError:
+    tokenizers_version = None
     HAS_HF = False
     print("warning: tokenizers not installed, skipping bpe training")
 
@@ -24,43 +39,143 @@ except ImportError:
 VOCAB_SIZES = [8000, 16000, 32000]
 OUT_DIR = "trained_tokenizers"
 
-def prepare_raw_corpus(in_path, out_path):
-    # Filter corpus quality
-    print(f"preparing raw corpus: {in_path} -> {out_path}")
+# Rough per-job memory model for the scheduler
+JOB_BASE_MB = 300
+JOB_MEM_FACTOR = {'bpe': 8, 'bpe-sweep': 8, 'sentencepiece': 6}
+
+# Cached SentencePiece input size for sweeps
+SP_SAMPLE_SENTENCES = 1000000
+
+# BPE text pipeline, by tokenizers class name; part of the word count cache key
+BPE_NORMALIZERS = ('NFD', 'Lowercase', 'StripAccents')
+BPE_PRE_TOKENIZERS = ('WhitespaceSplit', 'Punctuation')
+WORD_COUNTS_DIR = os.path.join(OUT_DIR, "word_counts")
+# Copies of one word per training string
+REPEAT_CHUNK = 4096
+
+def prepare_corpora(in_path, raw_out=None, morph_out=None, segmenter=None):
+    # One streaming pass writes both training corpora
+    print(f"preparing corpora from {in_path}")
     
     count = 0
     kept = 0
+    stats = new_stats()
     
-    with open(in_path, 'r', encoding='utf-8') as f_in, \
-         open(out_path, 'w', encoding='utf-8') as f_out:
+    with ExitStack() as stack:
+        f_in = stack.enter_context(open(in_path, 'r', encoding='utf-8'))
+        f_raw = stack.enter_context(open(raw_out, 'w', encoding='utf-8')) if raw_out else None
+        f_morph = stack.enter_context(open(morph_out, 'w', encoding='utf-8')) if morph_out else None
+        if f_morph and segmenter is None:
+            segmenter = MalayalamMorphologicalSegmenter()
         
-        for line in f_in:
-            line = line.strip()
-            count += 1
+        for block in iter_line_blocks(f_in):
+            # Score the block once for both filters
+            lines = [line.strip() for line in block]
+            scores = score_lines(lines)
+            stats['total_lines'] += len(lines)
             
-            # Perform basic checks
-            if not line or len(line) < 10:
-                continue
-                
-            # Check Malayalam content
-            mal_chars = sum(1 for c in line if '\u0D00' <= c <= '\u0D7F')
-            if mal_chars < len(line) * 0.4:
-                continue
-                
-            # Check sentence length
-            words = line.split()
-            if len(words) < 3 or len(words) > 100:
-                continue
-                
-            f_out.write(line + '\n')
-            kept += 1
+            # Raw corpus filter
+            if f_raw:
+                kept_lines = [line for line, keep in zip(lines, raw_mask(lines, scores)) if keep]
+                f_raw.writelines(line + '\n' for line in kept_lines)
+                kept += len(kept_lines)
+                    
+            # Morphological corpus, same filter as process_corpus
+            if f_morph:
+                for i, (line, keep) in enumerate(zip(lines, morph_mask(lines, scores)), count + 1):
+                    if not keep:
+                        continue
+                    try:
+                        seg_line = segment_line(segmenter, line, stats)
+                    except Exception as e:
+                        print(f"error on line {i}: {e}")
+                        continue
+                    f_morph.write(seg_line + '\n')
             
-            if count % 50000 == 0:
-                print(f"processed {count} lines, kept {kept}")
+            if count // 50000 != (count + len(lines)) // 50000:
+                print(f"processed {count + len(lines)} lines, kept {kept} raw / {stats['processed_lines']} morph")
+            count += len(lines)
+
+    if raw_out:
+        print(f"done. raw retention: {kept/count*100:.1f}%")
+    if morph_out:
+        print(f"done. morph retention: {stats['processed_lines']/count*100:.1f}%")
+    return stats
+
+def prepare_raw_corpus(in_path, out_path):
+    # Filter corpus quality
+    print(f"preparing raw corpus: {in_path} -> {out_path}")
+    prepare_corpora(in_path, raw_out=out_path)
 
-    print(f"done. retention: {kept/count*100:.1f}%")
+def copy_corpus(src, dst):
+    # Kernel-side copy (sendfile on Linux), bounded memory
+    # Not a hardlink: process_corpus truncates its output in place
+    shutil.copyfile(src, dst)
 
-def train_bpe(corpus_path, corpus_type, vocab_size):
+def bpe_normalizer():
+    return normalizers.Sequence([getattr(normalizers, name)() for name in BPE_NORMALIZERS])
+
+def bpe_pre_tokenizer():
+    return pre_tokenizers.Sequence([getattr(pre_tokenizers, name)() for name in BPE_PRE_TOKENIZERS])
+
+def word_counts_path(corpus_path, cache_dir=WORD_COUNTS_DIR):
+    # Keyed by corpus content, text pipeline and tokenizers version
+    h = hashlib.sha256()
+    with open(corpus_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    config = json.dumps([BPE_NORMALIZERS, BPE_PRE_TOKENIZERS, tokenizers_version])
+    h.update(config.encode('utf-8'))
+    return os.path.join(cache_dir, f"words_{h.hexdigest()[:24]}.tsv")
+
+def count_words(corpus_path):
+    # Normalize and pre-tokenize once, as tok.train would
+    normalizer = bpe_normalizer()
+    pre_tokenizer = bpe_pre_tokenizer()
+    counts = Counter()
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        for block in iter_line_blocks(f):
+            for line in block:
+                text = normalizer.normalize_str(line)
+                counts.update(piece for piece, _ in pre_tokenizer.pre_tokenize_str(text))
+    return counts
+
+@instrumentation.timed('word_counts_seconds')
+def load_word_counts(corpus_path, cache_dir=WORD_COUNTS_DIR, path=None):
+    # Word frequency table for a corpus, built on first use
+    # path: cache file already resolved by word_counts_path, saves re-hashing the corpus
+    path = path or word_counts_path(corpus_path, cache_dir)
+    if os.path.exists(path):
+        counts = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                word, count = line.rstrip('\n').split('\t')
+                counts[word] = int(count)
+        return counts
+    
+    counts = count_words(corpus_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Concurrent jobs may race here; the rename keeps the file whole
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for word, count in counts.most_common():
+            f.write(f"{word}\t{count}\n")
+    os.replace(tmp, path)
+    print(f"cached {len(counts)} word types for {corpus_path}: {path}")
+    return counts
+
+def iter_counted_words(counts, chunk=REPEAT_CHUNK):
+    # Each word `count` times, joined by spaces in bounded strings
+    for word, count in counts.items():
+        while count > 0:
+            n = min(count, chunk)
+            yield ' '.join([word] * n)
+            count -= n
+
+@instrumentation.timed('train_seconds', trainer='bpe')
+def train_bpe(corpus_path, corpus_type, vocab_size, out_dir=OUT_DIR, word_cache=True):
+    # word_cache: train from the cached word counts instead of the raw corpus,
+    # either True or the cache file path from word_counts_path
     if not HAS_HF:
         return None
         
@@ -70,17 +185,6 @@ def train_bpe(corpus_path, corpus_type, vocab_size):
         # Initialize tokenizer
         tok = Tokenizer(models.BPE(unk_token="[UNK]"))
         
-        tok.normalizer = normalizers.Sequence([
-            normalizers.NFD(),
-            normalizers.Lowercase(),
-            normalizers.StripAccents()
-        ])
-        
-        tok.pre_tokenizer = pre_tokenizers.Sequence([
-            pre_tokenizers.WhitespaceSplit(),
-            pre_tokenizers.Punctuation()
-        ])
-        
         trainer = trainers.BpeTrainer(
             vocab_size=vocab_size,
             min_frequency=2,
@@ -88,7 +192,19 @@ def train_bpe(corpus_path, corpus_type, vocab_size):
             show_progress=True
         )
         
-        tok.train([corpus_path], trainer)
+        if word_cache:
+            # Words are already normalized and split
+            counts = load_word_counts(corpus_path, path=word_cache if isinstance(word_cache, str) else None)
+            tok.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+            tok.train_from_iterator(iter_counted_words(counts), trainer)
+        else:
+            tok.normalizer = bpe_normalizer()
+            tok.pre_tokenizer = bpe_pre_tokenizer()
+            tok.train([corpus_path], trainer)
+        
+        # Full text pipeline for inference
+        tok.normalizer = bpe_normalizer()
+        tok.pre_tokenizer = bpe_pre_tokenizer()
         
         # Configure post-processing
         tok.post_processor = TemplateProcessing(
@@ -98,7 +214,7 @@ def train_bpe(corpus_path, corpus_type, vocab_size):
         )
         
         # Save tokenizer model
-        out_path = os.path.join(OUT_DIR, f"bpe_{corpus_type}_{vocab_size}.json")
+        out_path = os.path.join(out_dir, f"bpe_{corpus_type}_{vocab_size}.json")
         tok.save(out_path)
         print(f"saved to {out_path}")
         return out_path
@@ -107,13 +223,15 @@ def train_bpe(corpus_path, corpus_type, vocab_size):
         print(f"error training bpe: {e}")
         return None
 
-def train_sp(corpus_path, corpus_type, vocab_size):
+@instrumentation.timed('train_seconds', trainer='sentencepiece')
+def train_sp(corpus_path, corpus_type, vocab_size, num_threads=None):
     if not HAS_SP:
         return None
         
     print(f"training sp-{vocab_size} on {corpus_type}...")
     
     prefix = os.path.join(OUT_DIR, f"sp_{corpus_type}_{vocab_size}")
+    extra = {'num_threads': num_threads} if num_threads else {}
     
     try:
         spm.SentencePieceTrainer.train(
@@ -123,7 +241,8 @@ def train_sp(corpus_path, corpus_type, vocab_size):
             model_type='bpe',
             character_coverage=0.9995,
             normalization_rule_name='nmt_nfkc_cf',
-            split_by_whitespace=True
+            split_by_whitespace=True,
+            **extra
         )
         print(f"saved to {prefix}.model")
         return f"{prefix}.model"
@@ -132,7 +251,230 @@ def train_sp(corpus_path, corpus_type, vocab_size):
         print(f"error training sp: {e}")
         return None
 
+def truncate_bpe(src_path, vocab_size, out_path):
+    # Derive a smaller BPE model from the merge prefix of a larger one
+    with open(src_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    model = data['model']
+    vocab = model['vocab']
+    merges = model['merges']
+    
+    # Older tokenizers versions store merges as "a b"
+    pairs = [m if isinstance(m, list) else m.split(' ', 1) for m in merges]
+    
+    # Replay training: stop once the vocabulary reaches vocab_size
+    size = vocab[pairs[0][0] + pairs[0][1]] if pairs else len(vocab)
+    kept = 0
+    for a, b in pairs:
+        if size >= vocab_size:
+            break
+        if vocab[a + b] == size:
+            size += 1
+        kept += 1
+        
+    model['merges'] = merges[:kept]
+    model['vocab'] = {tok: i for tok, i in vocab.items() if i < size}
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"derived {out_path} ({size} tokens, {kept} merges)")
+    return out_path
+
+def sweep_bpe(corpus_path, corpus_type, vocab_sizes=VOCAB_SIZES, out_dir=OUT_DIR, word_cache=True):
+    # Train once at the largest size, truncate for the rest
+    sizes = sorted(vocab_sizes)
+    full = train_bpe(corpus_path, corpus_type, sizes[-1], out_dir, word_cache)
+    if not full:
+        return []
+    paths = []
+    for v_size in sizes[:-1]:
+        out_path = os.path.join(out_dir, f"bpe_{corpus_type}_{v_size}.json")
+        paths.append(truncate_bpe(full, v_size, out_path))
+    return paths + [full]
+
+def check_word_cache_equivalence(corpus_path, corpus_type, vocab_size):
+    # Compare training from cached word counts against training on the corpus
+    with tempfile.TemporaryDirectory() as tmp:
+        models_json = []
+        for word_cache in (False, True):
+            out_dir = os.path.join(tmp, str(word_cache))
+            os.makedirs(out_dir)
+            path = train_bpe(corpus_path, corpus_type, vocab_size, out_dir, word_cache)
+            if not path:
+                return False
+            with open(path, 'r', encoding='utf-8') as f:
+                models_json.append(json.load(f))
+                
+    same = models_json[0] == models_json[1]
+    print(f"word cache check bpe-{vocab_size} on {corpus_type}: {'identical' if same else 'DIFFERENT'}")
+    return same
+
+def check_sweep_equivalence(corpus_path, corpus_type, vocab_size, swept_path):
+    # Compare a derived model against an independently trained one
+    with tempfile.TemporaryDirectory() as tmp:
+        ref_path = train_bpe(corpus_path, corpus_type, vocab_size, out_dir=tmp)
+        if not ref_path:
+            return False
+        with open(ref_path, 'r', encoding='utf-8') as f:
+            ref = json.load(f)
+    with open(swept_path, 'r', encoding='utf-8') as f:
+        swept = json.load(f)
+        
+    same = ref == swept
+    print(f"sweep check bpe-{vocab_size} on {corpus_type}: {'identical' if same else 'DIFFERENT'}")
+    return same
+
+def sample_corpus(in_path, out_path, max_lines=SP_SAMPLE_SENTENCES, seed=42):
+    # One-pass reservoir sample, reused by every SentencePiece size
+    rng = random.Random(seed)
+    sample = []
+    n = -1
+    with open(in_path, 'r', encoding='utf-8') as f:
+        for n, line in enumerate(f):
+            if n < max_lines:
+                sample.append(line)
+            else:
+                j = rng.randint(0, n)
+                if j < max_lines:
+                    sample[j] = line
+                    
+    # Small corpora are used as-is
+    if n < max_lines:
+        return in_path
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.writelines(sample)
+    print(f"sampled {max_lines} of {n + 1} lines for sentencepiece: {out_path}")
+    return out_path
+
+def training_jobs(files, sweep=False, sp_files=None, word_counts=None):
+    # Grid of (kind, corpus type, corpus path, vocab size, word counts path)
+    # word_counts: corpus type -> word_counts_path, so jobs skip re-hashing the corpus
+    jobs = []
+    sp_files = sp_files or files
+    word_counts = word_counts or {}
+    for c_type, c_path in files.items():
+        words = word_counts.get(c_type, True)
+        if sweep:
+            jobs.append(('bpe-sweep', c_type, c_path, tuple(VOCAB_SIZES), words))
+        for v_size in VOCAB_SIZES:
+            if not sweep:
+                jobs.append(('bpe', c_type, c_path, v_size, words))
+            jobs.append(('sentencepiece', c_type, sp_files[c_type], v_size, None))
+    return jobs
+
+def estimate_job_mb(job):
+    kind, _, c_path, _, _ = job
+    corpus_mb = os.path.getsize(c_path) / (1024 * 1024)
+    return JOB_BASE_MB + corpus_mb * JOB_MEM_FACTOR[kind]
+
+def run_job(job, threads=None, own_process=False):
+    # Peak RSS is only per job when the job has its own process
+    kind, c_type, c_path, v_size, words = job
+    start = time.perf_counter()
+    error = None
+    
+    try:
+        if kind == 'bpe-sweep':
+            paths = sweep_bpe(c_path, c_type, v_size, word_cache=words)
+        elif kind == 'bpe':
+            paths = [train_bpe(c_path, c_type, v_size, word_cache=words)]
+        else:
+            paths = [train_sp(c_path, c_type, v_size, num_threads=threads)]
+    except Exception as e:
+        paths, error = [], str(e)
+    paths = [p for p in paths if p]
+    rss = instrumentation.peak_rss_mb() if own_process else None
+    if rss is not None:
+        instrumentation.gauge('train_peak_rss_mb', rss, kind=kind, corpus=c_type, vocab_size=v_size)
+        
+    return {
+        'kind': kind.split('-')[0],
+        'corpus': c_type,
+        'vocab_size': list(v_size) if isinstance(v_size, tuple) else v_size,
+        'threads': threads,
+        'paths': paths,
+        'status': 'ok' if paths else 'failed',
+        'error': error,
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': rss
+    }
+
+def _run_job(job, threads, conn):
+    # Child process entry point
+    # Rayon reads this when HF tokenizers first trains
+    os.environ['RAYON_NUM_THREADS'] = str(threads)
+    record = run_job(job, threads, own_process=True)
+    if instrumentation.ENABLED:
+        record['metrics'] = instrumentation.snapshot()
+    conn.send(record)
+    conn.close()
+
+def run_training_matrix(files, cores=None, memory_mb=None, threads_per_job=None,
+                        sweep=False, sp_files=None, word_counts=None):
+    # Run the training grid under a core and memory budget
+    jobs = training_jobs(files, sweep, sp_files, word_counts)
+    if not jobs:
+        return []
+    cores = cores or os.cpu_count() or 1
+    threads = threads_per_job or max(1, cores // len(jobs))
+    slots = max(1, cores // threads)
+    print(f"training {len(jobs)} jobs: {slots} concurrent x {threads} threads"
+          + (f", {memory_mb} MB budget" if memory_mb else ""))
+    
+    ctx = mp.get_context('spawn')
+    # Largest jobs first
+    pending = sorted(range(len(jobs)), key=lambda i: -estimate_job_mb(jobs[i]))
+    running = {}
+    records = [None] * len(jobs)
+    used_mb = 0
+    
+    while pending or running:
+        # Start every job that fits the budget
+        for i in list(pending):
+            if len(running) >= slots:
+                break
+            need = estimate_job_mb(jobs[i])
+            if memory_mb and running and used_mb + need > memory_mb:
+                continue
+            recv, send = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_run_job, args=(jobs[i], threads, send))
+            proc.start()
+            send.close()
+            running[proc.sentinel] = (i, proc, recv, need)
+            used_mb += need
+            pending.remove(i)
+            
+        # Collect finished jobs
+        for sentinel in wait(list(running)):
+            i, proc, recv, need = running.pop(sentinel)
+            proc.join()
+            used_mb -= need
+            kind, c_type, _, v_size, _ = jobs[i]
+            if recv.poll():
+                record = recv.recv()
+                instrumentation.merge(record.pop('metrics', None))
+            else:
+                record = {'kind': kind.split('-')[0], 'corpus': c_type, 'vocab_size': v_size,
+                          'threads': threads, 'paths': [], 'status': 'failed',
+                          'error': f"exit code {proc.exitcode}", 'seconds': None, 'peak_rss_mb': None}
+            recv.close()
+            records[i] = record
+            print(f"{kind}-{v_size} on {c_type}: {record['status']} ({record['seconds']}s)")
+            
+    return records
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cores', type=int, default=None, help='core budget (1 trains sequentially)')
+    parser.add_argument('--memory-mb', type=int, default=None, help='memory budget for concurrent jobs')
+    parser.add_argument('--threads', type=int, default=None, help='threads per training job')
+    parser.add_argument('--sweep', action='store_true',
+                        help='train bpe once at the largest size and derive the smaller models')
+    parser.add_argument('--check-sweep', action='store_true',
+                        help='verify derived bpe models against independent training')
+    parser.add_argument('--check-word-cache', action='store_true',
+                        help='verify bpe trained from cached word counts against training on the corpus')
+    args = parser.parse_args()
+    
     # Create output directory
     os.makedirs(OUT_DIR, exist_ok=True)
     
@@ -141,45 +483,72 @@ if __name__ == "__main__":
     morph_in = "enhanced_hybrid_training_data.txt"
     
     files = {}
+    raw_out = os.path.join(OUT_DIR, "raw_training_corpus.txt")
+    morph_out = os.path.join(OUT_DIR, "morphological_training_corpus.txt")
     
-    # Process raw corpus
     if os.path.exists(raw_in):
-        raw_out = os.path.join(OUT_DIR, "raw_training_corpus.txt")
-        prepare_raw_corpus(raw_in, raw_out)
+        if os.path.exists(morph_in):
+            # Reuse processed corpus
+            prepare_raw_corpus(raw_in, raw_out)
+            copy_corpus(morph_in, morph_out)
+        else:
+            # Segment alongside the raw pass
+            prepare_corpora(raw_in, raw_out, morph_out)
         files['raw'] = raw_out
-    else:
+        files['morphological'] = morph_out
+        print(f"prepared morphological corpus: {morph_out}")
+    elif os.path.exists(morph_in):
         print(f"warning: {raw_in} not found")
-        
-    # Process morphological corpus
-    if os.path.exists(morph_in):
-        # Copy processed corpus
-        morph_out = os.path.join(OUT_DIR, "morphological_training_corpus.txt")
-        with open(morph_in, 'r', encoding='utf-8') as fin, \
-             open(morph_out, 'w', encoding='utf-8') as fout:
-            fout.write(fin.read())
+        copy_corpus(morph_in, morph_out)
         files['morphological'] = morph_out
         print(f"prepared morphological corpus: {morph_out}")
     else:
+        print(f"warning: {raw_in} not found")
         print(f"warning: {morph_in} not found")
     
+    # Normalize and pre-tokenize each corpus once, before the jobs share it
+    word_counts = {}
+    if HAS_HF:
+        for c_type, c_path in files.items():
+            word_counts[c_type] = word_counts_path(c_path)
+            load_word_counts(c_path, path=word_counts[c_type])
+    
     # Train tokenizer models
     results = defaultdict(list)
+    sp_files = None
+    if args.sweep:
+        # One cached input for every SentencePiece size
+        sp_files = {c_type: sample_corpus(c_path, os.path.join(OUT_DIR, f"sp_sample_{c_type}.txt"))
+                    for c_type, c_path in files.items()}
     
-    for c_type, c_path in files.items():
-        for v_size in VOCAB_SIZES:
-            # Train BPE model
-            if path := train_bpe(c_path, c_type, v_size):
-                results['bpe'].append(path)
-                
-            # Train SentencePiece model
-            if path := train_sp(c_path, c_type, v_size):
-                results['sentencepiece'].append(path)
+    if args.cores == 1:
+        # Sequential fallback
+        jobs = [run_job(job) for job in training_jobs(files, args.sweep, sp_files, word_counts)]
+    else:
+        jobs = run_training_matrix(files, args.cores, args.memory_mb, args.threads,
+                                   args.sweep, sp_files, word_counts)
+    for record in jobs:
+        results[record['kind']].extend(record['paths'])
+        
+    if args.sweep and args.check_sweep:
+        for c_type, c_path in files.items():
+            for v_size in sorted(VOCAB_SIZES)[:-1]:
+                swept = os.path.join(OUT_DIR, f"bpe_{c_type}_{v_size}.json")
+                if os.path.exists(swept):
+                    check_sweep_equivalence(c_path, c_type, v_size, swept)
+    if args.check_word_cache:
+        for c_type, c_path in files.items():
+            check_word_cache_equivalence(c_path, c_type, min(VOCAB_SIZES))
     
     # Save training summary
     summary = {
         'models': dict(results),
-        'vocab_sizes': VOCAB_SIZES
+        'vocab_sizes': VOCAB_SIZES,
+        'jobs': jobs
     }
+    if args.cores == 1:
+        # Sequential jobs share this process, so only the run-wide peak is known
+        summary['peak_rss_mb'] = instrumentation.peak_rss_mb()
     
     with open(os.path.join(OUT_DIR, "training_summary.json"), 'w') as f:
         json.dump(summary, f, indent=2)
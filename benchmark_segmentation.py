@@ -0,0 +1,249 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# One encode thread, so numbers do not swing with machine load
+os.environ.setdefault('RAYON_NUM_THREADS', '1')
+
+import tokenizer_registry
+from create_sample_corpus import create_corpus
+from enhanced_corpus_processor import WORD_RE, process_corpus
+from enhanced_segmenter import MalayalamMorphologicalSegmenter
+from synthetic_corpus import generate
+
+RESULTS_FILE = 'benchmark_results.json'
+BASELINE_FILE = 'benchmark_baseline.json'
+# Allowed slowdown before a case counts as a regression
+TOLERANCE = 0.2
+REPEATS = 5
+TEXT_LENGTHS = (5, 20, 100, 500)
+# create_corpus repeats; each repeat is 32 lines
+CORPUS_SCALES = (100, 1000)
+# Zipf corpus with more types than the lru cache holds
+SYNTHETIC_TOKENS = 500000
+SYNTHETIC_TYPES = 100000
+# Suffixes peeled per word in the stacked case
+STACK_DEPTH = 3
+
+# Each sample loops the case for at least this long
+MIN_SECONDS = 0.2
+
+def best_of(fn, repeats, min_seconds=MIN_SECONDS):
+    # Fastest per-call time over several samples, in seconds
+    best = float('inf')
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+def result(count, seconds, unit):
+    # Every case is a throughput, so higher is better
+    return {'value': count / seconds, 'unit': unit, 'seconds': seconds}
+
+def quiet():
+    return contextlib.redirect_stdout(io.StringIO())
+
+def sample_words(corpus_path):
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        words = WORD_RE.findall(f.read())
+    return words, list(dict.fromkeys(words))
+
+def bench_segment_word(words, types, repeats):
+    cases = {}
+
+    # Cold: fresh caches, every type misses once
+    def cold():
+        seg = MalayalamMorphologicalSegmenter()
+        for w in types:
+            seg.segment_word(w)
+    cases['segment_word.cold'] = result(len(types), best_of(cold, repeats), 'words/s')
+
+    # Warm: token stream over primed caches
+    seg = MalayalamMorphologicalSegmenter()
+    for w in types:
+        seg.segment_word(w)
+    def warm():
+        for w in words:
+            seg.segment_word(w)
+    cases['segment_word.warm'] = result(len(words), best_of(warm, repeats), 'words/s')
+    return cases
+
+def bench_segment_text(words, repeats, lengths=TEXT_LENGTHS, n_words=50000):
+    cases = {}
+    seg = MalayalamMorphologicalSegmenter()
+    for length in lengths:
+        # Sentences of `length` words covering about n_words words
+        count = max(1, n_words // length)
+        texts = [' '.join(words[(i * length + j) % len(words)] for j in range(length)) + '.'
+                 for i in range(count)]
+        seg.segment_text(texts[0])
+        def run():
+            for t in texts:
+                seg.segment_text(t)
+        cases[f'segment_text.{length}w'] = result(count * length, best_of(run, repeats), 'words/s')
+    return cases
+
+def bench_process_corpus(scales=CORPUS_SCALES, repeats=1):
+    cases = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            in_file = os.path.join(tmp, f"corpus_{scale}.txt")
+            out_file = os.path.join(tmp, f"out_{scale}.txt")
+            with quiet():
+                create_corpus(in_file, repeats=scale)
+            with open(in_file, 'rb') as f:
+                n_lines = sum(1 for _ in f)
+            def run():
+                with quiet():
+                    process_corpus(in_file, out_file, checkpoint_every=0)
+            cases[f'process_corpus.{n_lines}l'] = result(n_lines, best_of(run, repeats), 'lines/s')
+    return cases
+
+def bench_synthetic(n_tokens=SYNTHETIC_TOKENS, n_types=SYNTHETIC_TYPES, repeats=1):
+    # Cache misses and rule coverage on a realistic vocabulary
+    cases = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        in_file = os.path.join(tmp, 'synthetic.txt')
+        out_file = os.path.join(tmp, 'out.txt')
+        with quiet():
+            stats = generate(in_file, n_tokens=n_tokens, n_types=n_types)
+        words, types = sample_words(in_file)
+        def cold():
+            seg = MalayalamMorphologicalSegmenter()
+            for w in words:
+                seg.segment_word(w)
+        cases[f'segment_word.synthetic_{n_types}t'] = result(len(words), best_of(cold, repeats), 'words/s')
+        # Stacked suffixes; stems are shared across words through the stem cache
+        def stacked():
+            seg = MalayalamMorphologicalSegmenter(stack_depth=STACK_DEPTH)
+            for w in words:
+                seg.segment_word(w)
+        cases[f'segment_word.synthetic_{n_types}t_depth{STACK_DEPTH}'] = \
+            result(len(words), best_of(stacked, repeats), 'words/s')
+        def run():
+            with quiet():
+                process_corpus(in_file, out_file, checkpoint_every=0)
+        cases[f'process_corpus.synthetic_{n_types}t'] = result(stats['lines'], best_of(run, repeats), 'lines/s')
+    return cases
+
+def bench_tokenizers(sentences, repeats):
+    cases = {}
+    seg = MalayalamMorphologicalSegmenter()
+    segmented = [seg.segment_text(s) for s in sentences]
+    for name, path in sorted(tokenizer_registry.discover().items()):
+        try:
+            model = tokenizer_registry.load_path(path)
+        except Exception as e:
+            print(f"skipping {name}: {e}")
+            continue
+        # Hybrid models see _SEP_ input, as in training
+        texts = segmented if 'morphological' in name else sentences
+        if tokenizer_registry.model_kind(path) == 'bpe':
+            run = lambda: model.encode_batch(texts)
+        else:
+            run = lambda: model.encode(texts)
+        cases[f'encode.{name}'] = result(len(texts), best_of(run, repeats), 'sentences/s')
+    return cases
+
+def run_suite(corpus_path, repeats=REPEATS, scales=CORPUS_SCALES, tokenizers=True,
+              synthetic_tokens=SYNTHETIC_TOKENS, synthetic_types=SYNTHETIC_TYPES):
+    # Sample words from the given corpus, or a generated one
+    with tempfile.TemporaryDirectory() as tmp:
+        if not os.path.exists(corpus_path):
+            with quiet():
+                corpus_path = create_corpus(os.path.join(tmp, 'sample.txt'))
+        words, types = sample_words(corpus_path)
+        with open(corpus_path, 'r', encoding='utf-8') as f:
+            sentences = [line.strip() for line in f if line.strip()][:10000]
+
+    cases = {}
+    print("benchmarking segment_word...")
+    cases.update(bench_segment_word(words, types, repeats))
+    print("benchmarking segment_text...")
+    cases.update(bench_segment_text(words, repeats))
+    print("benchmarking process_corpus...")
+    cases.update(bench_process_corpus(scales))
+    if synthetic_tokens:
+        print("benchmarking synthetic corpus...")
+        cases.update(bench_synthetic(synthetic_tokens, synthetic_types))
+    if tokenizers:
+        print("benchmarking tokenizers...")
+        cases.update(bench_tokenizers(sentences, repeats))
+
+    return {
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cases': cases
+    }
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # Names of cases slower than baseline by more than tolerance
+    regressions = []
+    if baseline.get('machine') != results['machine']:
+        print("warning: baseline was recorded on a different machine or python")
+    print(f"\n{'case':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, case in results['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            print(f"{name:<40} {'-':>12} {case['value']:>12.1f}      new")
+            continue
+        change = case['value'] / base['value'] - 1
+        flag = ''
+        if change < -tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<40} {base['value']:>12.1f} {case['value']:>12.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', default='malayalam_raw_corpus.txt', help='word and sentence source')
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--scales', type=int, nargs='+', default=list(CORPUS_SCALES),
+                        help='create_corpus repeats for the process_corpus cases')
+    parser.add_argument('--synthetic-tokens', type=int, default=SYNTHETIC_TOKENS,
+                        help='words in the synthetic Zipf corpus (0 skips it)')
+    parser.add_argument('--synthetic-types', type=int, default=SYNTHETIC_TYPES)
+    parser.add_argument('--no-tokenizers', action='store_true')
+    args = parser.parse_args()
+
+    results = run_suite(args.corpus, args.repeats, args.scales, not args.no_tokenizers,
+                        args.synthetic_tokens, args.synthetic_types)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"saved results to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nno regressions")
+    else:
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
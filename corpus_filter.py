@@ -0,0 +1,123 @@
+import os
+import re
+
+# Import NumPy library
+try:
+    import numpy as np
+    HAS_NP = True
+except ImportError:
+    HAS_NP = False
+
+# Define filter thresholds
+MIN_CHARS = 10
+MORPH_RATIO = 0.3
+RAW_RATIO = 0.4
+MIN_WORDS = 3
+MAX_WORDS = 100
+BLOCK_SIZE = 1 << 22
+
+# Universal newlines, as open() in text mode
+_NEWLINE_RE = re.compile(r'\r\n|\r|\n')
+
+# Deletes the Malayalam block (U+0D00-U+0D7F)
+_DROP_MALAYALAM = dict.fromkeys(range(0x0D00, 0x0D80))
+
+def malayalam_chars(line):
+    # Scalar count for the no-NumPy path of score_lines
+    return len(line) - len(line.translate(_DROP_MALAYALAM))
+
+def iter_line_blocks(f, block_size=BLOCK_SIZE):
+    # Yield lists of lines, about block_size bytes each
+    while True:
+        lines = f.readlines(block_size)
+        if not lines:
+            break
+        yield lines
+
+def iter_range_blocks(f, start, end, block_size=BLOCK_SIZE):
+    # Decoded line blocks from a binary byte range
+    # start and end must sit on line boundaries
+    f.seek(start)
+    pos = start
+    while pos < end:
+        data = f.read(min(block_size, end - pos))
+        if not data:
+            break
+        if not data.endswith(b'\n') and pos + len(data) < end:
+            data += f.readline()
+        pos += len(data)
+        text = data.decode('utf-8')
+        # \r and \r\n end lines too, as in text-mode reads
+        lines = _NEWLINE_RE.split(text) if '\r' in text else text.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        yield lines
+
+def shard_offsets(path, n_shards):
+    # Split file into byte ranges on line boundaries
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as f:
+        for k in range(1, n_shards):
+            target = max(size * k // n_shards, offsets[-1])
+            if target >= size:
+                break
+            # Move to the start of the next line
+            f.seek(target - 1 if target > 0 else 0)
+            if target > 0:
+                f.readline()
+            offsets.append(f.tell())
+    offsets.append(size)
+    return [(a, b) for a, b in zip(offsets, offsets[1:]) if b > a]
+
+def score_lines(lines):
+    # (chars, malayalam chars) per line
+    if not HAS_NP:
+        chars = [len(line) for line in lines]
+        mal = [malayalam_chars(line) for line in lines]
+        return chars, mal
+
+    if not lines:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Every line ends in '\n', so no segment is empty
+    buf = np.frombuffer(('\n'.join(lines) + '\n').encode('utf-8'), dtype=np.uint8)
+    starts = np.empty(len(lines), dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = np.flatnonzero(buf == 10)[:-1] + 1
+
+    # Code points start on non-continuation bytes
+    is_char = (buf & 0xC0) != 0x80
+    chars = np.add.reduceat(is_char.astype(np.int64), starts) - 1
+
+    # Malayalam is E0 B4 xx / E0 B5 xx in UTF-8
+    lead = np.zeros(len(buf), dtype=np.int64)
+    lead[:-1] = (buf[:-1] == 0xE0) & ((buf[1:] == 0xB4) | (buf[1:] == 0xB5))
+    mal = np.add.reduceat(lead, starts)
+    return chars, mal
+
+def keep_mask(lines, ratio, min_words=None, max_words=None, scores=None):
+    # Keep/drop mask over stripped lines
+    chars, mal = scores if scores is not None else score_lines(lines)
+
+    if HAS_NP:
+        keep = (chars >= MIN_CHARS) & (mal >= chars * ratio)
+        candidates = np.flatnonzero(keep)
+    else:
+        keep = [c >= MIN_CHARS and m >= c * ratio for c, m in zip(chars, mal)]
+        candidates = [i for i, k in enumerate(keep) if k]
+
+    # Word counts only for survivors
+    if min_words is not None or max_words is not None:
+        for i in candidates:
+            n = len(lines[i].split())
+            if (min_words is not None and n < min_words) or \
+               (max_words is not None and n > max_words):
+                keep[i] = False
+    return keep
+
+def morph_mask(lines, scores=None):
+    return keep_mask(lines, MORPH_RATIO, scores=scores)
+
+def raw_mask(lines, scores=None):
+    return keep_mask(lines, RAW_RATIO, MIN_WORDS, MAX_WORDS, scores=scores)
@@ -0,0 +1,216 @@
+import glob
+import gzip
+import json
+import lzma
+import os
+import sys
+from collections import Counter
+from corpus_filter import BLOCK_SIZE, iter_line_blocks, iter_range_blocks, morph_mask
+from instrumentation import timed_iter, timer
+
+# Import zstandard library
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+COMPRESSED = ('.gz', '.xz', '.zst')
+# Shard directories written by download_corpus.py list their shards here
+MANIFEST = 'manifest.json'
+
+# Streaming stages: read -> filter -> segment -> render/stats -> write
+# Each stage passes one block of lines (about BLOCK_SIZE bytes) at a time,
+# so memory stays flat whatever the input size.
+
+def _open(path, mode):
+    # Text stream for plain, gzip, xz or zstd files; '-' is stdin/stdout
+    if path == '-':
+        # Real streams, so redirecting sys.stdout for logs does not move the data
+        std = sys.__stdin__ if 'r' in mode else sys.__stdout__
+        if 'w' in mode:
+            std.flush()
+        return open(std.fileno(), mode, encoding='utf-8', closefd=False)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if path.endswith('.xz'):
+        return lzma.open(path, mode + 't', encoding='utf-8')
+    if path.endswith('.zst'):
+        if not HAS_ZSTD:
+            raise ImportError("zstandard not installed")
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def open_input(path):
+    return _open(path, 'r')
+
+def open_output(path):
+    return _open(path, 'w')
+
+def is_plain_file(path):
+    # Seekable uncompressed file, usable for byte-range sharding
+    return path != '-' and os.path.isfile(path) and not path.endswith(COMPRESSED)
+
+def manifest_shards(path):
+    # Shard files of a download_corpus.py directory, in manifest order
+    manifest_file = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_file):
+        raise FileNotFoundError(f"no {MANIFEST} in {path}")
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return [os.path.join(path, s['file']) for s in manifest['shards']]
+
+def expand_inputs(patterns):
+    # Globs to a sorted file list; '-' passes through
+    # A shard directory expands to its shards
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(manifest_shards(pattern))
+            continue
+        if pattern == '-' or os.path.exists(pattern):
+            paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            raise FileNotFoundError(f"no input matches {pattern}")
+        paths.extend(matches)
+    return paths
+
+def read_blocks(paths, block_size=BLOCK_SIZE):
+    # Stage 1: raw line blocks, one file open at a time
+    for path in paths:
+        with open_input(path) as f:
+            yield from iter_line_blocks(f, block_size)
+
+def read_plain_blocks(path, position, block_size=BLOCK_SIZE):
+    # Stage 1 for one plain file, starting at position['offset']
+    # position['offset'] is the end of the last yielded block; stages run in
+    # lockstep, so it is valid for every block the writer has passed on
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        for lines in iter_range_blocks(f, position['offset'], size, block_size):
+            position['offset'] = f.tell()
+            yield lines
+
+def skip_lines(blocks, n):
+    # Drop the first n lines of a block stream
+    for block in blocks:
+        if n >= len(block):
+            n -= len(block)
+            continue
+        if n:
+            block, n = block[n:], 0
+        yield block
+
+def new_stats():
+    return {
+        'total_lines': 0,
+        'processed_lines': 0,
+        'total_words': 0,
+        'segmented_words': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'morphemes': Counter(),
+        'rule_hits': Counter()
+    }
+
+def merge_stats(total, part):
+    for key, value in part.items():
+        total[key] += value
+    return total
+
+def segment_line(segmenter, line, stats):
+    # Segment a line that passed the filter
+    return render_line(segmenter, segmenter.split_tokens(line), stats)
+
+def render_line(segmenter, tokens, stats):
+    # Build output and stats from (span, Segment) pairs
+    out = []
+    suffixes = segmenter.suffixes
+    rule_suffixes = segmenter.matcher.rule_suffixes
+    morphemes = stats['morphemes']
+    rule_hits = stats['rule_hits']
+    words = 0
+    segmented = 0
+    
+    for t, seg in tokens:
+        if seg is None:
+            out.append(t)
+            continue
+        words += 1
+        if seg.rule < 0:
+            out.append(t)
+            continue
+        # Count morpheme types
+        segmented += 1
+        suffix = suffixes[seg.suffix_id]
+        morphemes[suffix] += 1
+        rule_hits[seg.rule] += 1
+        if seg.inner:
+            # Stacked suffixes count like outer ones
+            for r in seg.inner:
+                morphemes[rule_suffixes[r]] += 1
+                rule_hits[r] += 1
+            out.append(segmenter.render(t, seg))
+            continue
+        out.append(seg.stem + '_SEP_' + suffix)
+    
+    stats['total_words'] += words
+    stats['segmented_words'] += segmented
+    stats['processed_lines'] += 1
+    return ''.join(out)
+
+def filter_blocks(blocks, stats):
+    # Stage 2: stripped lines that pass the morph filter
+    # Yields one (possibly empty) list per input block
+    for block in blocks:
+        with timer('stage_seconds', stage='filter'):
+            lines = [line.strip() for line in block]
+            stats['total_lines'] += len(lines)
+            kept = [line for line, keep in zip(lines, morph_mask(lines)) if keep]
+        yield kept
+
+def segment_blocks(blocks, segmenter):
+    # Stage 3: (span, Segment) pairs per line
+    split_tokens = segmenter.split_tokens
+    for lines in blocks:
+        out = []
+        with timer('stage_seconds', stage='segment'):
+            for line in lines:
+                try:
+                    out.append(split_tokens(line))
+                except Exception as e:
+                    print(f"error segmenting line: {e}")
+        yield out
+
+def render_blocks(blocks, segmenter, stats):
+    # Stage 4: _SEP_ text, counting words, morphemes and rule hits
+    for lines in blocks:
+        with timer('stage_seconds', stage='stats'):
+            out = [render_line(segmenter, tokens, stats) for tokens in lines]
+        yield out
+
+def write_blocks(blocks, f_out):
+    # Stage 5: one output line per segmented line, passes blocks through
+    for lines in blocks:
+        if lines:
+            with timer('stage_seconds', stage='write'):
+                f_out.write('\n'.join(lines) + '\n')
+        yield lines
+
+def pipeline(blocks, segmenter, stats, f_out):
+    # Stages 2-5 over raw line blocks; pulling from `blocks` is the read stage
+    blocks = timed_iter('stage_seconds', blocks, stage='read')
+    blocks = filter_blocks(blocks, stats)
+    blocks = segment_blocks(blocks, segmenter)
+    blocks = render_blocks(blocks, segmenter, stats)
+    return write_blocks(blocks, f_out)
+
+def stream_corpus(inputs, output, segmenter, stats, block_size=BLOCK_SIZE):
+    # Full pipeline; yields each written block so callers can report progress
+    paths = expand_inputs(inputs)
+    with open_output(output) as f_out:
+        yield from pipeline(read_blocks(paths, block_size), segmenter, stats, f_out)
@@ -1,6 +1,6 @@
 import os
 
-def create_corpus():
+def create_corpus(filename="malayalam_raw_corpus.txt", repeats=100):
     # Define test sentences
     # Include sentence variety
     data = [
@@ -48,11 +48,10 @@ def create_corpus():
             
     # Repeat for volume
     final_data = []
-    for _ in range(100):
+    for _ in range(repeats):
         final_data.extend(expanded)
         
     # Save corpus file
-    filename = "malayalam_raw_corpus.txt"
     print(f"creating {filename}...")
     
     with open(filename, "w", encoding="utf-8") as f:
@@ -62,6 +61,7 @@ def create_corpus():
     size = os.path.getsize(filename) / (1024 * 1024)
     print(f"done. {len(final_data)} lines written.")
     print(f"file size: {size:.2f} MB")
+    return filename
 
 if __name__ == "__main__":
     create_corpus()
@@ -1,39 +1,288 @@
-from datasets import load_dataset
+import argparse
+import glob
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import shutil
 from tqdm import tqdm
+from corpus_filter import morph_mask
+from corpus_stream import COMPRESSED, MANIFEST, manifest_shards, open_input
 
-def download_data():
-    # Download IndicCorp Malayalam
-    print("downloading malayalam corpus...")
-    
-    # Use streaming mode
-    # Load IndicCorp dataset
+# Import datasets library
+try:
+    from datasets import load_dataset
+    HAS_DATASETS = True
+except ImportError:
+    HAS_DATASETS = False
+
+DATASET = ("ai4bharat/IndicCorpv2", "indiccorp_v2", "mal_Mlym")
+OUT_DIR = 'corpus_shards'
+# Single plain file read by the processor, trainers and verify scripts
+FLAT_FILE = 'malayalam_raw_corpus.txt'
+LIMIT = 200000
+SHARDS = 8
+# Shard size when there is no line limit
+SHARD_LINES = 1000000
+MIN_CHARS = 20
+# Source items filtered per batch
+BATCH = 10000
+# Local files read as sources; .jsonl rows carry a 'text' field
+TEXT_EXTS = ('.txt', '.jsonl')
+
+def shard_name(k):
+    return f"shard_{k:05d}.txt.gz"
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def save_manifest(out_dir, manifest):
+    # Atomic replace, so a crash leaves the previous manifest
+    path = os.path.join(out_dir, MANIFEST)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def local_files(path):
+    # Text and jsonl files under a directory, sorted
+    exts = tuple(e + c for e in TEXT_EXTS for c in ('',) + COMPRESSED)
+    files = sorted(glob.glob(os.path.join(path, '**', '*'), recursive=True))
+    return [p for p in files if os.path.isfile(p) and p.endswith(exts)]
+
+def iter_file(path):
+    with open_input(path) as f:
+        if '.jsonl' in os.path.basename(path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line).get('text', '')
+        else:
+            yield from f
+
+def iter_source(source=None):
+    # Raw texts: IndicCorp by default, or a local file or directory
+    # Not a generator, so load errors surface here
+    if source is None or (os.path.isdir(source) and not local_files(source)):
+        if not HAS_DATASETS:
+            raise ImportError("datasets not installed")
+        if source is None:
+            name, config, split = DATASET
+            dataset = load_dataset(name, config, split=split, streaming=True)
+        else:
+            # Saved Hugging Face dataset directory
+            dataset = load_dataset(source, split='train', streaming=True)
+        return (item.get('text', '') for item in dataset)
+    paths = local_files(source) if os.path.isdir(source) else [source]
+    return itertools.chain.from_iterable(iter_file(path) for path in paths)
+
+def _digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+def _open_shard(path):
+    # mtime=0 keeps the gzip bytes, and so the checksum, reproducible
+    raw = gzip.GzipFile(path, 'wb', compresslevel=6, mtime=0)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='\n')
+
+def _resume(out_dir, config):
+    # Manifest trimmed to shards still intact on disk, None to start over,
+    # False when the directory holds a different download
+    manifest = load_manifest(out_dir)
+    if manifest is None:
+        return None
+    if manifest['config'] != config:
+        print(f"{out_dir} was written with other settings {manifest['config']}; use --restart")
+        return False
+    kept = []
+    for s in manifest['shards']:
+        path = os.path.join(out_dir, s['file'])
+        if not os.path.exists(path) or os.path.getsize(path) != s['bytes']:
+            print(f"{s['file']} is missing or truncated, redoing from there")
+            break
+        kept.append(s)
+    if len(kept) < len(manifest['shards']):
+        # A finished download with a damaged shard has to be redone from there
+        manifest['complete'] = False
+    manifest['shards'] = kept
+    manifest['consumed'] = kept[-1]['consumed'] if kept else 0
+    return manifest
+
+def download_data(out_dir=OUT_DIR, source=None, limit=LIMIT, shards=SHARDS, shard_lines=SHARD_LINES,
+                  min_chars=MIN_CHARS, morph_filter=False, dedup=False, resume=True):
+    # Writes gzip shards of equal line counts plus a manifest
+    # limit=None takes the whole source in shard_lines shards
+    if limit:
+        shard_lines = math.ceil(limit / shards)
+    config = {
+        'source': source or '/'.join(DATASET),
+        'limit': limit,
+        'shard_lines': shard_lines,
+        'min_chars': min_chars,
+        'filter': morph_filter,
+        'dedup': dedup
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _resume(out_dir, config) if resume else None
+    if manifest is False:
+        return None
+    if manifest and manifest.get('complete'):
+        print(f"{out_dir} is already complete ({len(manifest['shards'])} shards)")
+        return manifest
+    if manifest is None:
+        manifest = {'config': config, 'consumed': 0, 'shards': [], 'complete': False}
+
+    written = sum(s['lines'] for s in manifest['shards'])
+    seen = set()
+    if dedup:
+        # Rebuild the seen set from the shards _resume kept, not the file on disk
+        for s in manifest['shards']:
+            with open_input(os.path.join(out_dir, s['file'])) as f:
+                seen.update(_digest(line.rstrip('\n')) for line in f)
+    if manifest['shards']:
+        print(f"resuming after {len(manifest['shards'])} shards / {written} lines "
+              f"({manifest['consumed']} source items)")
+
+    source_name = source or DATASET[0]
+    print(f"reading {source_name} -> {out_dir} (limit: {limit or 'no'} lines, {shard_lines} per shard)")
     try:
-        dataset = load_dataset("ai4bharat/IndicCorpv2", "indiccorp_v2", split="mal_Mlym", streaming=True)
+        texts = itertools.islice(iter_source(source), manifest['consumed'], None)
     except Exception as e:
         print(f"error loading dataset: {e}")
-        return
-    
-    out_file = "malayalam_raw_corpus.txt"
-    limit = 200000 # Set line limit
-    
-    print(f"saving to {out_file} (limit: {limit} lines)")
-    
-    count = 0
-    with open(out_file, 'w', encoding='utf-8') as f:
-        for item in tqdm(dataset):
-            text = item.get('text', '').strip()
-            
-            # Skip short lines
-            if len(text) < 20:
-                continue
-                
-            f.write(text + '\n')
-            count += 1
-            
-            if count >= limit:
+        return None
+
+    consumed = manifest['consumed']
+    k = len(manifest['shards'])
+    f = None
+    progress = tqdm(initial=written, total=limit or None, unit='lines')
+    try:
+        while not limit or written < limit:
+            batch = [text.strip() for text in itertools.islice(texts, BATCH)]
+            if not batch:
                 break
-                
-    print(f"done. saved {count} lines to {out_file}")
+            mask = morph_mask(batch) if morph_filter else [True] * len(batch)
+            for text, keep in zip(batch, mask):
+                consumed += 1
+                # Skip short lines
+                if not keep or len(text) < min_chars:
+                    continue
+                if dedup:
+                    digest = _digest(text)
+                    if digest in seen:
+                        continue
+                    seen.add(digest)
+
+                if f is None:
+                    tmp = os.path.join(out_dir, shard_name(k) + '.tmp')
+                    f = _open_shard(tmp)
+                    lines = raw_bytes = 0
+                data = text + '\n'
+                f.write(data)
+                lines += 1
+                raw_bytes += len(data.encode('utf-8'))
+                written += 1
+                progress.update()
+
+                if lines == shard_lines or written == limit:
+                    _finish_shard(f, out_dir, k, lines, raw_bytes, consumed, manifest)
+                    f = None
+                    k += 1
+                    if written == limit:
+                        break
+        # Last, shorter shard when the source ran out
+        if f is not None:
+            _finish_shard(f, out_dir, k, lines, raw_bytes, consumed, manifest)
+            f = None
+    finally:
+        progress.close()
+        if f is not None:
+            f.close()
+
+    manifest['complete'] = True
+    save_manifest(out_dir, manifest)
+    total_bytes = sum(s['bytes'] for s in manifest['shards'])
+    print(f"done. {written} lines in {len(manifest['shards'])} shards "
+          f"({total_bytes:,} bytes compressed) in {out_dir}")
+    return manifest
+
+def _finish_shard(f, out_dir, k, lines, raw_bytes, consumed, manifest):
+    # Close, checksum and publish one shard, then record it
+    tmp = f.buffer.name
+    f.close()
+    # The gzip trailer is written on close, so sync afterwards
+    with open(tmp, 'rb+') as raw:
+        os.fsync(raw.fileno())
+    path = os.path.join(out_dir, shard_name(k))
+    os.replace(tmp, path)
+    manifest['shards'].append({
+        'file': shard_name(k),
+        'lines': lines,
+        'raw_bytes': raw_bytes,
+        'bytes': os.path.getsize(path),
+        'sha256': file_sha256(path),
+        'consumed': consumed
+    })
+    manifest['consumed'] = consumed
+    save_manifest(out_dir, manifest)
+
+def write_flat(out_dir=OUT_DIR, flat_file=FLAT_FILE):
+    # Concatenate the shards, in manifest order, into one plain text file
+    tmp = flat_file + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f_out:
+        for path in manifest_shards(out_dir):
+            with open_input(path) as f_in:
+                shutil.copyfileobj(f_in, f_out)
+    os.replace(tmp, flat_file)
+    print(f"wrote {flat_file}")
+    return flat_file
+
+def verify_shards(out_dir=OUT_DIR):
+    # Names of shards whose size or checksum disagrees with the manifest
+    bad = []
+    for s in load_manifest(out_dir)['shards']:
+        path = os.path.join(out_dir, s['file'])
+        if not os.path.exists(path) or os.path.getsize(path) != s['bytes'] or \
+           file_sha256(path) != s['sha256']:
+            bad.append(s['file'])
+    return bad
 
 if __name__ == "__main__":
-    download_data()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default=OUT_DIR, help='shard directory')
+    parser.add_argument('--source', default=None,
+                        help='local text/jsonl file or directory (optionally compressed) instead of IndicCorp')
+    parser.add_argument('--limit', type=int, default=LIMIT, help='lines to keep (0 for all)')
+    parser.add_argument('--shards', type=int, default=SHARDS, help='shards to split --limit lines into')
+    parser.add_argument('--shard-lines', type=int, default=SHARD_LINES, help='lines per shard when --limit is 0')
+    parser.add_argument('--min-chars', type=int, default=MIN_CHARS)
+    parser.add_argument('--filter', action='store_true', help='keep only lines passing the morph filter')
+    parser.add_argument('--dedup', action='store_true', help='drop exact duplicate lines')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing manifest')
+    parser.add_argument('--verify', action='store_true', help='check shard checksums and exit')
+    parser.add_argument('--flat', nargs='?', const=FLAT_FILE, default=None,
+                        help=f'also write the shards as one plain file (default {FLAT_FILE})')
+    args = parser.parse_args()
+
+    if args.verify:
+        bad = verify_shards(args.output)
+        print(f"{len(bad)} bad shard(s): {', '.join(bad)}" if bad else "all shards ok")
+    else:
+        manifest = download_data(args.output, args.source, args.limit or None, args.shards,
+                                 args.shard_lines, args.min_chars, args.filter, args.dedup,
+                                 not args.restart)
+        if manifest and args.flat:
+            write_flat(args.output, args.flat)
@@ -1,77 +1,372 @@
+import argparse
+import contextlib
+import json
 import os
 import re
+import shutil
+import sys
+import tempfile
+import time
 from collections import Counter
-from enhanced_segmenter import MalayalamMorphologicalSegmenter
+from concurrent.futures import ProcessPoolExecutor
+import instrumentation
+from corpus_filter import iter_line_blocks, iter_range_blocks, morph_mask, shard_offsets
+from corpus_stream import (COMPRESSED, expand_inputs, is_plain_file, merge_stats, new_stats,
+                           open_output, pipeline, read_blocks, read_plain_blocks, render_line,
+                           skip_lines)
+from enhanced_segmenter import MalayalamMorphologicalSegmenter, iter_tokens
 
-def process_corpus():
-    # Initialize processor
-    segmenter = MalayalamMorphologicalSegmenter()
-    in_file = 'malayalam_raw_corpus.txt'
-    out_file = 'enhanced_hybrid_training_data.txt'
+IN_FILE = 'malayalam_raw_corpus.txt'
+OUT_FILE = 'enhanced_hybrid_training_data.txt'
+TYPES_FILE = 'word_type_frequencies.tsv'
+CHECKPOINT_EVERY = 100000
+
+# Word tokens as split by segment_text
+WORD_RE = re.compile(r'(?:[\u0D00-\u0D7F]|\w)+')
+
+# Per-process segmenter for pool workers
+_worker_segmenter = None
+
+def iter_kept_lines(blocks, stats):
+    # Batch-filter line blocks, yield (line number, kept line)
+    i = 0
+    for block in blocks:
+        lines = [line.strip() for line in block]
+        mask = morph_mask(lines)
+        stats['total_lines'] += len(lines)
+        for line, keep in zip(lines, mask):
+            i += 1
+            if keep:
+                yield i, line
+
+def _init_worker(validation, cache_path, stack_depth=1):
+    global _worker_segmenter
+    _worker_segmenter = MalayalamMorphologicalSegmenter(validation=validation, cache_path=cache_path,
+                                                        stack_depth=stack_depth)
+
+def _collect_cache_stats(segmenter, stats, before=(0, 0)):
+    # Record store lookups since `before`
+    store = segmenter.store
+    if store is None:
+        return
+    store.flush()
+    stats['cache_hits'] += store.hits - before[0]
+    stats['cache_misses'] += store.misses - before[1]
+
+def _process_shard(task):
+    in_file, start, end, part_file = task
+    stats = new_stats()
+    store = _worker_segmenter.store
+    before = (store.hits, store.misses) if store else (0, 0)
+    
+    # Same stages as the serial path, so stage timers cover shards too
+    with open(in_file, 'rb') as f_in, \
+         open(part_file, 'w', encoding='utf-8') as f_out:
+        for _ in pipeline(iter_range_blocks(f_in, start, end), _worker_segmenter, stats, f_out):
+            pass
+                
+    _collect_cache_stats(_worker_segmenter, stats, before)
+    # Worker metrics travel back with the stats
+    return stats, instrumentation.snapshot(reset=True) if instrumentation.ENABLED else None
+
+def _part_base(out_file):
+    # Worker part files sit next to the output, or in the temp dir for stdout
+    if out_file == '-':
+        return os.path.join(tempfile.gettempdir(), f"mltok_stdout_{os.getpid()}")
+    return out_file
+
+def _process_parallel(in_file, out_file, workers, validation, cache_path, stack_depth=1):
+    # Shard input and run worker pool
+    shards = shard_offsets(in_file, workers * 4)
+    tasks = [(in_file, a, b, f"{_part_base(out_file)}.part{k:04d}") for k, (a, b) in enumerate(shards)]
+    stats = new_stats()
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(validation, cache_path, stack_depth)) as pool:
+            for k, (part, metrics) in enumerate(pool.map(_process_shard, tasks), 1):
+                merge_stats(stats, part)
+                instrumentation.merge(metrics)
+                print(f"shard {k}/{len(tasks)} done | kept {stats['processed_lines']}")
+        
+        # Concatenate shard outputs in order; the output may be compressed or stdout
+        with open_output(out_file) as f_out:
+            for task in tasks:
+                with open(task[3], 'r', encoding='utf-8') as f_part:
+                    shutil.copyfileobj(f_part, f_out)
+    finally:
+        for task in tasks:
+            if os.path.exists(task[3]):
+                os.remove(task[3])
+                
+    return stats
+
+def _process_file(task):
+    # One whole input file through the streaming stages
+    in_file, part_file = task
+    stats = new_stats()
+    store = _worker_segmenter.store
+    before = (store.hits, store.misses) if store else (0, 0)
+    with open(part_file, 'w', encoding='utf-8') as f_out:
+        for _ in pipeline(read_blocks([in_file]), _worker_segmenter, stats, f_out):
+            pass
+    _collect_cache_stats(_worker_segmenter, stats, before)
+    return stats, instrumentation.snapshot(reset=True) if instrumentation.ENABLED else None
+
+def _process_files(inputs, out_file, workers, validation, cache_path, stack_depth=1):
+    # One task per input file, e.g. download_corpus.py shards
+    tasks = [(path, f"{_part_base(out_file)}.part{k:04d}") for k, path in enumerate(inputs)]
+    stats = new_stats()
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(validation, cache_path, stack_depth)) as pool:
+            for k, (part, metrics) in enumerate(pool.map(_process_file, tasks), 1):
+                merge_stats(stats, part)
+                instrumentation.merge(metrics)
+                print(f"file {k}/{len(tasks)} done | kept {stats['processed_lines']}")
+        
+        # Concatenate in input order; the output may be compressed or stdout
+        with open_output(out_file) as f_out:
+            for task in tasks:
+                with open(task[1], 'r', encoding='utf-8') as f_part:
+                    shutil.copyfileobj(f_part, f_out)
+    finally:
+        for task in tasks:
+            if os.path.exists(task[1]):
+                os.remove(task[1])
+    
+    return stats
+
+def checkpoint_path(out_file):
+    return out_file + '.ckpt'
+
+def dump_stats(stats):
+    # JSON-safe copy of a stats dict
+    return {k: dict(v) if isinstance(v, Counter) else v for k, v in stats.items()}
+
+def restore_stats(data):
+    stats = new_stats()
+    for key, value in data.items():
+        if key == 'rule_hits':
+            value = Counter({int(rule): n for rule, n in value.items()})
+        elif key == 'morphemes':
+            value = Counter(value)
+        stats[key] = value
+    return stats
+
+def save_checkpoint(path, state):
+    # Write then rename, so a kill never leaves a torn checkpoint
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_checkpoint(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _input_key(inputs):
+    # Identifies the input a checkpoint belongs to
+    return [[p, os.path.getsize(p) if p != '-' else None] for p in inputs]
+
+def _process_serial(inputs, out_file, validation, cache_path,
+                    checkpoint_every=CHECKPOINT_EVERY, resume=False, stack_depth=1):
+    segmenter = MalayalamMorphologicalSegmenter(validation=validation, cache_path=cache_path,
+                                                stack_depth=stack_depth)
+    stats = new_stats()
     
-    if not os.path.exists(in_file):
-        print(f"error: {in_file} not found")
+    # Checkpoints need an output we can truncate and append to
+    plain_out = out_file != '-' and not out_file.endswith(COMPRESSED)
+    ckpt = checkpoint_path(out_file) if checkpoint_every and plain_out else None
+    state = None
+    if resume:
+        if ckpt and os.path.exists(ckpt):
+            state = load_checkpoint(ckpt)
+            if state['inputs'] != _input_key(inputs):
+                print(f"checkpoint {ckpt} is for other input, starting over")
+                state = None
+        else:
+            print("no checkpoint found, starting from the beginning")
+    
+    position = {'offset': 0}
+    out_offset = 0
+    if state:
+        stats = restore_stats(state['stats'])
+        position['offset'] = state['offset']
+        out_offset = state['out_offset']
+        # Drop output written after the checkpoint
+        with open(out_file, 'r+b') as f:
+            f.truncate(out_offset)
+        print(f"resuming at line {stats['total_lines']}")
+    
+    # A single plain file is read by byte range; streams skip the done lines
+    if len(inputs) == 1 and is_plain_file(inputs[0]):
+        blocks = read_plain_blocks(inputs[0], position)
+    else:
+        blocks = skip_lines(read_blocks(inputs), stats['total_lines'])
+    
+    f_out = open(out_file, 'a' if state else 'w', encoding='utf-8') if ckpt else open_output(out_file)
+    start = time.perf_counter()
+    lines0, words0 = stats['total_lines'], stats['total_words']
+    reported = saved = lines0
+    with f_out:
+        for _ in pipeline(blocks, segmenter, stats, f_out):
+            lines = stats['total_lines']
+            if ckpt and lines - saved >= checkpoint_every:
+                saved = lines
+                # Output must be on disk before the checkpoint points past it
+                f_out.flush()
+                os.fsync(f_out.fileno())
+                if segmenter.store is not None:
+                    segmenter.store.flush()
+                save_checkpoint(ckpt, {
+                    'inputs': _input_key(inputs),
+                    'offset': position['offset'],
+                    'out_offset': f_out.tell(),
+                    'stats': dump_stats(stats)
+                })
+            if lines - reported >= 20000:
+                reported = lines
+                elapsed = time.perf_counter() - start
+                total_words = stats['total_words']
+                rate = (stats['segmented_words'] / total_words * 100) if total_words > 0 else 0
+                print(f"processed {lines} lines | kept {stats['processed_lines']} | seg rate: {rate:.1f}% | "
+                      f"{(lines - lines0) / elapsed:,.0f} lines/s | "
+                      f"{(total_words - words0) / elapsed:,.0f} words/s")
+    
+    # Finished; a later --resume starts over
+    if ckpt and os.path.exists(ckpt):
+        os.remove(ckpt)
+    _collect_cache_stats(segmenter, stats)
+    segmenter.close()
+    return stats
+
+def build_type_table(in_file):
+    # Pass one: word type frequencies over kept lines
+    counts = Counter()
+    with open(in_file, 'r', encoding='utf-8') as f_in:
+        for _, line in iter_kept_lines(iter_line_blocks(f_in), new_stats()):
+            counts.update(WORD_RE.findall(line))
+    return counts
+
+def save_type_table(counts, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for word, count in counts.most_common():
+            f.write(f"{word}\t{count}\n")
+
+def load_type_table(path):
+    counts = Counter()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            word, count = line.rstrip('\n').split('\t')
+            counts[word] = int(count)
+    return counts
+
+def _segment_types(words):
+    stats = new_stats()
+    store = _worker_segmenter.store
+    before = (store.hits, store.misses) if store else (0, 0)
+    segs = [_worker_segmenter.split_word(w) for w in words]
+    # Flushes the store, so no chunk's segmentations are left pending
+    _collect_cache_stats(_worker_segmenter, stats, before)
+    return segs, stats, instrumentation.snapshot(reset=True) if instrumentation.ENABLED else None
+
+def segment_types(words, workers=1, validation='off', cache_path=None, chunk_size=5000,
+                  stack_depth=1, stats=None):
+    # Segment each type once; store lookups are added to stats when given
+    words = list(words)
+    stats = stats if stats is not None else new_stats()
+    if workers <= 1:
+        segmenter = MalayalamMorphologicalSegmenter(validation=validation, cache_path=cache_path,
+                                                    stack_depth=stack_depth)
+        segs = [segmenter.split_word(w) for w in words]
+        _collect_cache_stats(segmenter, stats)
+        segmenter.close()
+        return dict(zip(words, segs))
+    
+    chunks = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size)]
+    table = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(validation, cache_path, stack_depth)) as pool:
+        for chunk, (segs, part, metrics) in zip(chunks, pool.map(_segment_types, chunks)):
+            table.update(zip(chunk, segs))
+            merge_stats(stats, part)
+            instrumentation.merge(metrics)
+    return table
+
+def _process_vocab_first(in_file, out_file, workers, validation, cache_path, types_file,
+                         stack_depth=1):
+    counts = build_type_table(in_file)
+    print(f"pass 1: {len(counts)} types / {sum(counts.values())} tokens")
+    if types_file:
+        save_type_table(counts, types_file)
+        print(f"saved type frequencies to {types_file}")
+    
+    stats = new_stats()
+    table = segment_types(counts, workers, validation, cache_path, stack_depth=stack_depth,
+                          stats=stats)
+    print(f"pass 2: segmented {len(table)} types")
+    
+    # Rewrite corpus through the type table
+    segmenter = MalayalamMorphologicalSegmenter()
+    with open(in_file, 'r', encoding='utf-8') as f_in, open_output(out_file) as f_out:
+        for _, line in iter_kept_lines(iter_line_blocks(f_in), stats):
+            tokens = [(t, table[t] if is_word else None) for t, is_word in iter_tokens(line)]
+            seg_line = render_line(segmenter, tokens, stats)
+            f_out.write(seg_line + '\n')
+            
+    return stats
+
+def process_corpus(in_file=IN_FILE, out_file=OUT_FILE, workers=1, validation='off',
+                   cache_path=None, vocab_first=False, types_file=TYPES_FILE,
+                   checkpoint_every=CHECKPOINT_EVERY, resume=False, stack_depth=1):
+    # in_file: path, glob, '-' or a list of them; .gz/.xz/.zst are read as streams
+    try:
+        inputs = expand_inputs(in_file)
+    except FileNotFoundError as e:
+        print(f"error: {e}")
         return None
     
-    print(f"processing {in_file} -> {out_file}")
+    # Several input files run one per worker; byte-range sharding and the
+    # two-pass mode need one seekable plain file
+    per_file = workers > 1 and not vocab_first and len(inputs) > 1 and '-' not in inputs
+    if (workers > 1 or vocab_first) and not per_file and \
+       not (len(inputs) == 1 and is_plain_file(inputs[0])):
+        print("note: streamed input, falling back to serial mode")
+        workers, vocab_first = 1, False
+    # Checkpoints are kept by the serial path only
+    if resume and (workers > 1 or vocab_first):
+        print("note: --resume runs the serial path")
+        workers, vocab_first = 1, False
     
-    # Initialize counters
-    total_lines = 0
-    processed_lines = 0
-    total_words = 0
-    segmented_words = 0
-    morphemes = Counter()
+    print(f"processing {', '.join(inputs)} -> {out_file}")
     
-    with open(in_file, 'r', encoding='utf-8') as f_in, \
-         open(out_file, 'w', encoding='utf-8') as f_out:
+    if vocab_first:
+        stats = _process_vocab_first(inputs[0], out_file, workers, validation, cache_path, types_file,
+                                     stack_depth)
+    elif per_file and workers > 1:
+        stats = _process_files(inputs, out_file, workers, validation, cache_path, stack_depth)
+    elif workers > 1:
+        stats = _process_parallel(inputs[0], out_file, workers, validation, cache_path, stack_depth)
+    else:
+        stats = _process_serial(inputs, out_file, validation, cache_path, checkpoint_every, resume,
+                                stack_depth)
         
-        for i, line in enumerate(f_in, 1):
-            total_lines += 1
-            line = line.strip()
-            
-            # Skip invalid lines
-            if not line or len(line) < 10:
-                continue
-                
-            # Check Malayalam content
-            mal_chars = sum(1 for c in line if '\u0D00' <= c <= '\u0D7F')
-            if mal_chars < len(line) * 0.3:
-                continue
-            
-            try:
-                # Segment text
-                seg_line = segmenter.segment_text(line)
-                
-                # Update statistics
-                words = re.findall(r'(?:[\u0D00-\u0D7F]|\w)+', line)
-                segs = re.findall(rf'\w*_SEP_\w*', seg_line)
-                
-                total_words += len(words)
-                segmented_words += len(segs)
-                
-                # Count morpheme types
-                for w in segs:
-                    if '_SEP_' in w:
-                        parts = w.split('_SEP_')
-                        if len(parts) == 2:
-                            morphemes[parts[1]] += 1
-                
-                f_out.write(seg_line + '\n')
-                processed_lines += 1
-                
-                if i % 20000 == 0:
-                    rate = (segmented_words / total_words * 100) if total_words > 0 else 0
-                    print(f"processed {i} lines | kept {processed_lines} | seg rate: {rate:.1f}%")
-                    
-            except Exception as e:
-                print(f"error on line {i}: {e}")
-                continue
+    total_lines = stats['total_lines']
+    processed_lines = stats['processed_lines']
+    total_words = stats['total_words']
+    segmented_words = stats['segmented_words']
 
     # Print final statistics
     seg_rate = (segmented_words / total_words * 100) if total_words > 0 else 0
     print("\ndone.")
     print(f"kept: {processed_lines}/{total_lines} ({processed_lines/total_lines*100:.1f}%)")
     print(f"seg rate: {seg_rate:.1f}%")
+    if cache_path:
+        print(f"cache: {stats['cache_hits']} hits / {stats['cache_misses']} misses ({cache_path})")
     
     return {
         'total_lines': total_lines,
@@ -79,7 +374,9 @@ def process_corpus():
         'total_words': total_words,
         'segmented_words': segmented_words,
         'seg_rate': seg_rate,
-        'unique_morphemes': len(morphemes)
+        'unique_morphemes': len(stats['morphemes']),
+        'morphemes': dict(stats['morphemes']),
+        'rule_hits': dict(stats['rule_hits'])
     }
 
 def save_metrics(stats):
@@ -109,6 +406,29 @@ Morpheme type diversity & {stats['unique_morphemes']} types & Rich morphological
     print("saved enhanced_results_table.tex")
 
 if __name__ == "__main__":
-    stats = process_corpus()
-    if stats:
-        save_metrics(stats)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', nargs='+', default=[IN_FILE],
+                        help="files, globs or shard directories; '-' reads stdin, .gz/.xz/.zst are decompressed on the fly")
+    parser.add_argument('--output', default=OUT_FILE)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--validation', default='off')
+    parser.add_argument('--cache', default=None, help='persistent segmentation cache (sqlite)')
+    parser.add_argument('--vocab-first', action='store_true',
+                        help='segment unique word types once, then rewrite the corpus')
+    parser.add_argument('--types', default=TYPES_FILE, help='type frequency output for --vocab-first')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY,
+                        help='input lines between checkpoints (0 disables)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the checkpoint next to --output')
+    parser.add_argument('--stack-depth', type=int, default=1,
+                        help='suffixes split per word; above 1 peels stacked suffixes off the stem')
+    args = parser.parse_args()
+    
+    # Keep stdout clean when it carries the corpus
+    log = contextlib.redirect_stdout(sys.stderr) if args.output == '-' else contextlib.nullcontext()
+    with log:
+        stats = process_corpus(args.input, args.output, args.workers, args.validation, args.cache,
+                               args.vocab_first, args.types, args.checkpoint_every, args.resume,
+                               args.stack_depth)
+        if stats:
+            save_metrics(stats)
@@ -1,6 +1,9 @@
 import re
+import time
+from collections import namedtuple
 from functools import lru_cache
-from mlmorph import Analyser
+import instrumentation
+from segmentation_cache import SegmentationStore, rules_fingerprint
 
 # Define morphological rules
 # Pattern replacement pairs
@@ -63,19 +66,195 @@ MORPH_RULES = [
     (r'(.{4,})സാർ$', r'\1_SEP_സാർ'),
 ]
 
+# Chillu letters and the consonants they stand for before a vowel sign
+CHILLU = {'ണ': 'ൺ', 'ന': 'ൻ', 'ര': 'ർ', 'ല': 'ൽ', 'ള': 'ൾ'}
+VOWEL_SIGNS = set('ാിീുൂൃെേൈൊോൌൗ')
+
+# Rule shape understood by SuffixMatcher
+RULE_SHAPE = re.compile(r'\(\.\{(\d+),\}\)([^\\.^$*+?{}\[\]|()]+)\$')
+
+class SuffixMatcher:
+    # Reversed-suffix trie built from MORPH_RULES
+    # Node layout: [children, [(rule_idx, min_stem), ...]]
+    def __init__(self, rules):
+        self.root = [{}, []]
+        self.rule_suffixes = []
+        self.min_stems = []
+        # Distinct suffixes, indexed by suffix id
+        self.suffixes = []
+        self.suffix_ids = []
+        
+        for idx, (pat, repl) in enumerate(rules):
+            m = RULE_SHAPE.fullmatch(pat)
+            if not m or repl != r'\1_SEP_' + m.group(2):
+                raise ValueError(f"unsupported rule shape: {pat!r} -> {repl!r}")
+            min_stem, suffix = int(m.group(1)), m.group(2)
+            self.rule_suffixes.append(suffix)
+            self.min_stems.append(min_stem)
+            if suffix not in self.suffixes:
+                self.suffixes.append(suffix)
+            self.suffix_ids.append(self.suffixes.index(suffix))
+            
+            # Insert suffix right to left
+            node = self.root
+            for char in reversed(suffix):
+                node = node[0].setdefault(char, [{}, []])
+            node[1].append((idx, min_stem))
+            
+    def match(self, word):
+        # Single right-to-left walk
+        # Lowest rule index wins, as in the old sequential scan
+        best = -1
+        node = self.root
+        for i in range(len(word) - 1, -1, -1):
+            node = node[0].get(word[i])
+            if node is None:
+                break
+            for idx, min_stem in node[1]:
+                if best >= 0 and idx > best:
+                    break
+                if i >= min_stem:
+                    best = idx
+                    break
+        return best
+    
+    def split(self, word):
+        # Return (stem, suffix) or None
+        idx = self.match(word)
+        if idx < 0:
+            return None
+        suffix = self.rule_suffixes[idx]
+        return word[:len(word) - len(suffix)], suffix
+
+# Tokenize preserving punctuation
+# Group 1 marks word runs, Malayalam included
+TOKEN_RE = re.compile(r'((?:[\u0D00-\u0D7F]|\w)+)|[^\w\u0D00-\u0D7F]+')
+
+def iter_tokens(text):
+    # Yield (span, is_word) pairs in one scan
+    for m in TOKEN_RE.finditer(text):
+        yield m.group(), m.lastindex is not None
+
+# Structured result per word
+# suffix_id indexes segmenter.suffixes, rule indexes MORPH_RULES; -1 when unsplit
+# inner holds the rules of stacked suffixes between stem and the outer one,
+# innermost first; empty unless stack_depth > 1
+Segment = namedtuple('Segment', 'stem suffix_id rule inner', defaults=((),))
+
+# mlmorph usage per word
+# off: rules only, validate: analyse and cache, analyser: keep splits mlmorph accepts
+VALIDATION_MODES = ('off', 'validate', 'analyser')
+
 class MalayalamMorphologicalSegmenter:
-    def __init__(self):
-        self.analyser = Analyser()
-        # Compile regex patterns
-        self.rules = []
-        for pat, repl in MORPH_RULES:
-            self.rules.append((re.compile(pat), repl))
+    def __init__(self, validation='off', analysis_cache_size=50000,
+                 cache_size=50000, cache_path=None, stack_depth=1):
+        if validation not in VALIDATION_MODES:
+            raise ValueError(f"unknown validation mode: {validation}")
+        if stack_depth < 1:
+            raise ValueError(f"stack_depth must be at least 1: {stack_depth}")
+        self.validation = validation
+        # Suffixes peeled per word; 1 is the classic single split
+        self.stack_depth = stack_depth
+        self._analyser = None
+        # Per-instance caches, so instances are not kept alive
+        self.split_word = lru_cache(maxsize=cache_size)(self._split_word)
+        self.analyse = lru_cache(maxsize=analysis_cache_size)(self._analyse)
+        # Stem -> inner rule chain, shared by every word built on the stem
+        self.peel = lru_cache(maxsize=cache_size)(self._peel)
+        # Compile suffix rules
+        self.matcher = SuffixMatcher(MORPH_RULES)
+        self.suffixes = self.matcher.suffixes
+        self.match = self.matcher.match
+        
+        # Metrics hooks exist only when instrumentation is on
+        self._metrics_token = None
+        if instrumentation.ENABLED:
+            self.match = self._match_instrumented
+            self._metrics_token = instrumentation.register_collector(self.cache_stats)
+        
+        # Optional persistent store behind the lru cache
+        self.store = None
+        if cache_path:
+            self.store = SegmentationStore(cache_path,
+                                           rules_fingerprint(MORPH_RULES, validation, stack_depth))
+        
+    @property
+    def analyser(self):
+        # Load mlmorph on first use
+        if self._analyser is None:
+            from mlmorph import Analyser
+            self._analyser = Analyser()
+        return self._analyser
+    
+    def _analyse(self, word):
+        try:
+            with instrumentation.timer('mlmorph_analyse_seconds'):
+                return tuple(self.analyser.analyse(word))
+        except ImportError:
+            raise
+        except Exception:
+            return ()
             
-    @lru_cache(maxsize=50000)
-    def segment_word(self, word):
+    def _match_instrumented(self, word):
+        start = time.perf_counter()
+        rule = self.matcher.match(word)
+        instrumentation.observe('rule_match_seconds', time.perf_counter() - start)
+        instrumentation.incr('rule_matches', rule=rule)
+        return rule
+    
+    def cache_stats(self):
+        # lru counters; evictions = misses that are no longer cached
+        stats = {}
+        for name, cache in (('segment_cache', self.split_word), ('analysis_cache', self.analyse),
+                            ('stem_cache', self.peel)):
+            info = cache.cache_info()
+            stats[f'{name}_hits'] = info.hits
+            stats[f'{name}_misses'] = info.misses
+            stats[f'{name}_evictions'] = info.misses - info.currsize
+            stats[f'{name}_size'] = info.currsize
+        return stats
+    
+    def close(self):
+        # Keep this instance's cache counts after it is gone
+        if self._metrics_token is not None:
+            final = {k: v for k, v in self.cache_stats().items() if not k.endswith('_size')}
+            instrumentation.unregister_collector(self._metrics_token, final)
+            self._metrics_token = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+            
+    def _segment(self, word, rules):
+        # rules: matched chain, outermost suffix first
+        if not rules:
+            return Segment(word, -1, -1)
+        rule_suffixes = self.matcher.rule_suffixes
+        cut = sum(len(rule_suffixes[r]) for r in rules)
+        inner = tuple(reversed(rules[1:]))
+        return Segment(word[:len(word) - cut], self.matcher.suffix_ids[rules[0]], rules[0], inner)
+    
+    def _inner_stem(self, word, rule):
+        # Stem in its standalone spelling, same length as the surface stem
+        # A vowel-sign suffix turns a final chillu back into its consonant (കൾ + ിൽ -> കളിൽ)
+        suffix = self.matcher.rule_suffixes[rule]
+        stem = word[:len(word) - len(suffix)]
+        if suffix[0] in VOWEL_SIGNS and stem[-1:] in CHILLU:
+            stem = stem[:-1] + CHILLU[stem[-1]]
+        return stem
+    
+    def _peel(self, stem, depth):
+        # Further suffixes on a stem, outermost first, at most depth of them
+        rule = self.match(stem)
+        if rule < 0:
+            return ()
+        if depth == 1:
+            return (rule,)
+        return (rule,) + self.peel(self._inner_stem(stem, rule), depth - 1)
+    
+    def _split_word(self, word):
         # Skip short words
         if not word or len(word) <= 2:
-            return word
+            return Segment(word, -1, -1)
             
         # Check Malayalam script
         is_malayalam = False
@@ -84,40 +263,66 @@ class MalayalamMorphologicalSegmenter:
                 is_malayalam = True
                 break
         if not is_malayalam:
-            return word
+            return Segment(word, -1, -1)
+            
+        # Check persistent store
+        if self.store is not None:
+            rules = self.store.get(word)
+            if rules is not None:
+                return self._segment(word, rules)
             
         # Validate with mlmorph
-        # Optional validation step
-        try:
-            self.analyser.analyse(word)
-        except:
-            pass
+        if self.validation == 'validate':
+            self.analyse(word)
             
         # Apply segmentation rules
-        curr = word
-        for pat, repl in self.rules:
-            match = pat.match(curr)
-            if match:
-                curr = pat.sub(repl, curr)
-                break
-                
-        return curr
+        rule = self.match(word)
+        if rule >= 0 and self.validation == 'analyser' and not self.analyse(word):
+            rule = -1
+        
+        if rule < 0:
+            rules = ()
+        elif self.stack_depth == 1:
+            rules = (rule,)
+        else:
+            # Peel the stem through the shared stem cache
+            rules = (rule,) + self.peel(self._inner_stem(word, rule), self.stack_depth - 1)
+            
+        if self.store is not None:
+            self.store.put(word, rules)
+        return self._segment(word, rules)
+    
+    def render(self, word, seg):
+        # _SEP_ text form of a Segment
+        if seg.rule < 0:
+            return word
+        if seg.inner:
+            # Inner suffixes as spelled in the word, so the pieces join back to it
+            parts = [seg.stem]
+            pos = len(seg.stem)
+            for r in seg.inner:
+                end = pos + len(self.matcher.rule_suffixes[r])
+                parts.append(word[pos:end])
+                pos = end
+            parts.append(word[pos:])
+            return '_SEP_'.join(parts)
+        return seg.stem + '_SEP_' + self.suffixes[seg.suffix_id]
+    
+    def segment_word(self, word):
+        return self.render(word, self.split_word(word))
+    
+    def split_tokens(self, text):
+        # (span, Segment or None) pairs, separators kept
+        split = self.split_word
+        return [(t, split(t) if is_word else None) for t, is_word in iter_tokens(text)]
+    
+    def segment_tokens(self, text):
+        # Segmented pieces, separators kept
+        render = self.render
+        return [t if seg is None else render(t, seg) for t, seg in self.split_tokens(text)]
     
     def segment_text(self, text):
-        # Tokenize preserving punctuation
-        # Regex handles Malayalam
-        pattern = r'(?:[\u0D00-\u0D7F]|\w)+|[^\w\u0D00-\u0D7F]+'
-        tokens = re.findall(pattern, text)
-        out = []
-        
-        for t in tokens:
-            # Segment word tokens
-            if re.match(r'(?:[\u0D00-\u0D7F]|\w)+$', t):
-                out.append(self.segment_word(t))
-            else:
-                out.append(t)
-                
-        return ''.join(out)
+        return ''.join(self.segment_tokens(text))
 
 if __name__ == "__main__":
     # Run basic tests
@@ -1,8 +1,7 @@
 
 import json
 import os
-from tokenizers import Tokenizer
-import sentencepiece as spm
+import tokenizer_registry
 
 def generate_latex_tables():
     # Define sample words
@@ -21,8 +20,8 @@ def generate_latex_tables():
         print("Models not found. Skipping qualitative table.")
         return
 
-    tokenizer_raw = Tokenizer.from_file(bpe_raw_path)
-    tokenizer_morph = Tokenizer.from_file(bpe_morph_path)
+    tokenizer_raw = tokenizer_registry.load_path(bpe_raw_path)
+    tokenizer_morph = tokenizer_registry.load_path(bpe_morph_path)
 
     # Generate qualitative table
     latex_qual = []
@@ -81,7 +80,7 @@ def generate_latex_tables():
     for name, path, mtype in models:
         if os.path.exists(path):
             if mtype == "bpe":
-                tok = Tokenizer.from_file(path)
+                tok = tokenizer_registry.load_path(path)
                 count = len(tok.encode(sample_text).tokens)
                 latex_quant.append(f"{name} & {count} \\\\")
     
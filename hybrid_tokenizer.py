@@ -0,0 +1,147 @@
+import argparse
+import json
+import threading
+import time
+from collections import namedtuple
+import tokenizer_registry
+from enhanced_segmenter import MalayalamMorphologicalSegmenter
+
+try:
+    from tokenizers import AddedToken, Tokenizer
+    HAS_HF = True
+except ImportError:
+    HAS_HF = False
+
+DEFAULT_MODEL = "bpe_morphological_16000"
+
+SEP_TOKEN = '_SEP_'
+# What to do with the encoded _SEP_ marker
+# keep: leave as trained, strip: drop it, merge: collapse it to one token
+SEP_MODES = ('keep', 'strip', 'merge')
+STAGES = ('segment', 'encode', 'post')
+
+HybridEncoding = namedtuple('HybridEncoding', 'ids tokens')
+
+class HybridTokenizer:
+    # Raw sentences -> segmentation -> BPE ids, one batch at a time
+    def __init__(self, model=DEFAULT_MODEL, segmenter=None, sep_mode='keep',
+                 add_special_tokens=True):
+        if sep_mode not in SEP_MODES:
+            raise ValueError(f"unknown sep mode: {sep_mode}")
+        self.sep_mode = sep_mode
+        self.add_special_tokens = add_special_tokens
+        # Accept a registry name or a model path
+        if model.endswith(('.json', '.mltk')):
+            self.tokenizer = tokenizer_registry.load_path(model)
+        else:
+            self.tokenizer = tokenizer_registry.load(model)
+        self.segmenter = segmenter or MalayalamMorphologicalSegmenter()
+
+        # As trained the marker is the run '_' 'sep' '_', which a literal 'sep' or
+        # '_sep_' in the text also produces. strip and merge give it its own special
+        # token (the first id past the trained vocab) on a private copy of the model,
+        # so only a literal uppercase '_SEP_' in the input is still taken for a marker
+        self.sep_id = None
+        if sep_mode != 'keep':
+            if not HAS_HF:
+                raise ImportError("tokenizers not installed")
+            tokenizer = Tokenizer.from_str(self.tokenizer.to_str())
+            tokenizer.add_special_tokens([AddedToken(SEP_TOKEN, special=True, normalized=False)])
+            self.tokenizer = tokenizer
+            self.sep_id = tokenizer.token_to_id(SEP_TOKEN)
+
+        # sqlite connections are per thread; serialize segmentation when a store is used
+        self._segment_lock = threading.Lock() if self.segmenter.store is not None else None
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {
+                'batches': 0,
+                'sentences': 0,
+                'tokens': 0,
+                'seconds': dict.fromkeys(STAGES, 0.0)
+            }
+
+    def stats(self):
+        # Totals plus mean ms per sentence for each stage
+        with self._stats_lock:
+            stats = dict(self._stats, seconds=dict(self._stats['seconds']))
+        n = stats['sentences']
+        stats['ms_per_sentence'] = {
+            stage: (secs * 1000 / n if n else 0.0) for stage, secs in stats['seconds'].items()
+        }
+        return stats
+
+    def segment_batch(self, sentences):
+        # One joined string per sentence, words through the segmenter cache
+        segment = self.segmenter.segment_text
+        if self._segment_lock is None:
+            return [segment(s) for s in sentences]
+        with self._segment_lock:
+            return [segment(s) for s in sentences]
+
+    def _strip(self, ids, tokens):
+        # Drop every marker token
+        sep = self.sep_id
+        if sep not in ids:
+            return ids, tokens
+        kept = [i for i, t in enumerate(ids) if t != sep]
+        return [ids[i] for i in kept], [tokens[i] for i in kept]
+
+    def encode_batch(self, sentences):
+        t0 = time.perf_counter()
+        segmented = self.segment_batch(sentences)
+        t1 = time.perf_counter()
+        encodings = self.tokenizer.encode_batch(segmented, add_special_tokens=self.add_special_tokens)
+        t2 = time.perf_counter()
+
+        if self.sep_mode == 'strip':
+            strip = self._strip
+            results = [HybridEncoding(*strip(e.ids, e.tokens)) for e in encodings]
+        else:
+            # merge: the marker is already one token
+            results = [HybridEncoding(e.ids, e.tokens) for e in encodings]
+        t3 = time.perf_counter()
+
+        with self._stats_lock:
+            stats = self._stats
+            stats['batches'] += 1
+            stats['sentences'] += len(sentences)
+            stats['tokens'] += sum(len(r.ids) for r in results)
+            seconds = stats['seconds']
+            seconds['segment'] += t1 - t0
+            seconds['encode'] += t2 - t1
+            seconds['post'] += t3 - t2
+        return results
+
+    def encode(self, sentence):
+        return self.encode_batch([sentence])[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--sep', default='keep', choices=SEP_MODES)
+    parser.add_argument('--input', default=None, help='one sentence per line')
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args()
+
+    hybrid = HybridTokenizer(args.model, sep_mode=args.sep)
+    if args.input is None:
+        sentences = ["കേരളത്തിൽ കുട്ടികൾ പഠിക്കുന്നു.", "അവരുടെ വീട്ടിൽ നിന്ന് വന്നു."]
+        for s, enc in zip(sentences, hybrid.encode_batch(sentences)):
+            print(f"{s} -> {enc.tokens}")
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            batch = []
+            for line in f:
+                line = line.strip()
+                if line:
+                    batch.append(line)
+                if len(batch) >= args.batch_size:
+                    hybrid.encode_batch(batch)
+                    batch = []
+            if batch:
+                hybrid.encode_batch(batch)
+    print(json.dumps(hybrid.stats(), indent=2))
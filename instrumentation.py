@@ -0,0 +1,290 @@
+import atexit
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+
+# Peak RSS is unavailable on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# MLTOK_METRICS=1 turns collection on; MLTOK_METRICS_FILE is written at exit
+# (.prom for Prometheus text, anything else JSON). MLTOK_PROFILE=<ms> starts
+# the sampling profiler, which writes folded stacks to MLTOK_PROFILE_FILE.
+ENABLED = os.environ.get('MLTOK_METRICS', '') not in ('', '0')
+METRICS_FILE = os.environ.get('MLTOK_METRICS_FILE')
+PROFILE_MS = float(os.environ.get('MLTOK_PROFILE') or 0)
+PROFILE_FILE = os.environ.get('MLTOK_PROFILE_FILE', 'profile.folded')
+
+# Keys are (name, ((label, value), ...))
+_counters = Counter()
+_timers = {}
+_gauges = {}
+_collectors = {}
+# Last values of collectors that were unregistered, plus merged worker values
+_retired = Counter()
+# Collector values already shipped by snapshot(reset=True)
+_shipped = Counter()
+_lock = threading.Lock()
+_NULL = nullcontext()
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+def incr(name, n=1, **labels):
+    if ENABLED:
+        key = _key(name, labels)
+        with _lock:
+            _counters[key] += n
+
+def observe(name, seconds, **labels):
+    # Add one timing to a count/sum summary
+    if ENABLED:
+        key = _key(name, labels)
+        with _lock:
+            t = _timers.setdefault(key, [0, 0.0, 0.0])
+            t[0] += 1
+            t[1] += seconds
+            t[2] = max(t[2], seconds)
+
+def gauge(name, value, **labels):
+    if ENABLED:
+        with _lock:
+            _gauges[_key(name, labels)] = value
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+def timer(name, **labels):
+    # Context manager; a shared no-op when disabled
+    return _Timer(name, labels) if ENABLED else _NULL
+
+def timed(name, **labels):
+    # Decorator; returns the function untouched when disabled
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start, **labels)
+        return inner
+    return wrap
+
+def timed_iter(name, iterable, **labels):
+    # Times each next() on iterable; passes it through when disabled
+    if not ENABLED:
+        return iterable
+    def gen():
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            observe(name, time.perf_counter() - start, **labels)
+            yield item
+    return gen()
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KB elsewhere
+    return round(rss / (1 << 20 if sys.platform == 'darwin' else 1024), 1)
+
+def register_collector(method):
+    # Bound method returning {name: value}, summed into gauges at snapshot
+    # Held weakly so instances can be collected; returns a removal token
+    token = object()
+    with _lock:
+        _collectors[token] = weakref.WeakMethod(method)
+    return token
+
+def unregister_collector(token, final=None):
+    # final: the collector's last values, kept in later snapshots
+    with _lock:
+        _collectors.pop(token, None)
+        if final:
+            _retired.update(final)
+
+def _collected():
+    # Summed collector values, live and retired, by name
+    with _lock:
+        values = Counter(_retired)
+        collectors = list(_collectors.items())
+    for token, ref in collectors:
+        method = ref()
+        if method is None:
+            unregister_collector(token)
+            continue
+        values.update(method())
+    return values
+
+def _collect():
+    gauges = dict(_gauges)
+    collected = _collected()
+    for name, value in collected.items():
+        gauges[_key(name, {})] = value
+    return gauges, collected
+
+def _render(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+def snapshot(reset=False):
+    # Plain-dict view of every metric
+    gauges, collected = _collect() if ENABLED else ({}, Counter())
+    with _lock:
+        # Collector values are shipped as deltas since the last reset, so a
+        # parent can add them up across a worker's tasks
+        delta = {name: value - _shipped[name] for name, value in collected.items()}
+        data = {
+            'counters': {_render(k): v for k, v in _counters.items()},
+            'timers': {_render(k): {'count': t[0], 'seconds': t[1], 'max_seconds': t[2]}
+                       for k, t in _timers.items()},
+            'gauges': {_render(k): v for k, v in gauges.items()},
+            'raw': {
+                'counters': [[k[0], list(k[1]), v] for k, v in _counters.items()],
+                'timers': [[k[0], list(k[1]), t] for k, t in _timers.items()],
+                'gauges': [[k[0], list(k[1]), v] for k, v in _gauges.items()],
+                'collected': delta
+            }
+        }
+        if reset:
+            _counters.clear()
+            _timers.clear()
+            _shipped.clear()
+            _shipped.update(collected)
+    data['gauges']['peak_rss_mb'] = peak_rss_mb()
+    return data
+
+def merge(data):
+    # Fold a snapshot from a worker process into this one
+    if not ENABLED or not data:
+        return
+    with _lock:
+        for name, labels, value in data['raw']['counters']:
+            _counters[(name, tuple(tuple(l) for l in labels))] += value
+        for name, labels, (count, seconds, max_seconds) in data['raw']['timers']:
+            t = _timers.setdefault((name, tuple(tuple(l) for l in labels)), [0, 0.0, 0.0])
+            t[0] += count
+            t[1] += seconds
+            t[2] = max(t[2], max_seconds)
+        for name, labels, value in data['raw']['gauges']:
+            _gauges[(name, tuple(tuple(l) for l in labels))] = value
+        # Cache stats add up across workers
+        _retired.update(data['raw'].get('collected', {}))
+
+def to_json(data=None):
+    data = dict(data or snapshot())
+    data.pop('raw', None)
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+def _split(rendered):
+    name, _, labels = rendered.partition('{')
+    return name, ('{' + labels) if labels else ''
+
+def to_prometheus(data=None):
+    # Prometheus text exposition format
+    data = data or snapshot()
+    lines = []
+    typed = set()
+    def head(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE mltok_{name} {kind}")
+    for rendered, value in sorted(data['counters'].items()):
+        name, labels = _split(rendered)
+        head(name, 'counter')
+        lines.append(f"mltok_{name}{labels} {value}")
+    for rendered, t in sorted(data['timers'].items()):
+        name, labels = _split(rendered)
+        head(name, 'summary')
+        lines.append(f"mltok_{name}_count{labels} {t['count']}")
+        lines.append(f"mltok_{name}_sum{labels} {t['seconds']:.6f}")
+    for rendered, value in sorted(data['gauges'].items()):
+        if value is None:
+            continue
+        name, labels = _split(rendered)
+        head(name, 'gauge')
+        lines.append(f"mltok_{name}{labels} {value}")
+    return '\n'.join(lines) + '\n'
+
+def write(path):
+    text = to_prometheus() if path.endswith('.prom') else to_json()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+# Sampling profiler: SIGPROF every interval, stacks of the main thread
+_stacks = Counter()
+
+def _sample(signum, frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    _stacks[';'.join(reversed(stack))] += 1
+
+def start_profiler(interval_ms=5.0):
+    # Unix only; CPU-time sampling of the main thread
+    import signal
+    if not hasattr(signal, 'setitimer'):
+        print("warning: sampling profiler needs setitimer, not started")
+        return False
+    signal.signal(signal.SIGPROF, _sample)
+    signal.setitimer(signal.ITIMER_PROF, interval_ms / 1000, interval_ms / 1000)
+    return True
+
+def stop_profiler():
+    import signal
+    if hasattr(signal, 'setitimer'):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+
+def write_profile(path=PROFILE_FILE):
+    # Folded stacks, for flamegraph.pl or speedscope
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in _stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+def _at_exit():
+    # Only the main process writes; pool workers report through merge()
+    if mp.parent_process() is not None:
+        return
+    if PROFILE_MS:
+        stop_profiler()
+        write_profile()
+    if ENABLED and METRICS_FILE:
+        write(METRICS_FILE)
+
+if PROFILE_MS and mp.parent_process() is None and threading.current_thread() is threading.main_thread():
+    start_profiler(PROFILE_MS)
+if (ENABLED and METRICS_FILE) or PROFILE_MS:
+    atexit.register(_at_exit)
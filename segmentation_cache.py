@@ -0,0 +1,100 @@
+import hashlib
+import sqlite3
+from importlib import metadata
+
+# Bump when the stored value format changes
+STORE_SCHEMA = 3
+
+def mlmorph_version():
+    try:
+        return metadata.version('mlmorph')
+    except metadata.PackageNotFoundError:
+        return 'none'
+
+def rules_fingerprint(rules, validation='off', stack_depth=1):
+    # Key stored segmentations on everything that changes them
+    h = hashlib.sha256()
+    h.update(f"schema={STORE_SCHEMA}".encode('utf-8'))
+    h.update(repr(list(rules)).encode('utf-8'))
+    h.update(mlmorph_version().encode('utf-8'))
+    h.update(validation.encode('utf-8'))
+    h.update(f"depth={stack_depth}".encode('utf-8'))
+    return h.hexdigest()
+
+class SegmentationStore:
+    # Persistent word -> rule chain table shared by processes
+    # Chains are stored as 'outer,inner,...' rule indices; '' means unsplit
+    def __init__(self, path, fingerprint, flush_every=2000):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.flush_every = flush_every
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+        # WAL lets several workers read while one writes
+        # Callers serialize access, so threads may share the connection
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._check_fingerprint()
+
+    def _check_fingerprint(self):
+        # Drop entries written under other rules
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is None or row[0] != self.fingerprint:
+                if row is not None:
+                    print(f"segmentation cache {self.path}: rules changed, invalidating")
+                self.conn.execute('DROP TABLE IF EXISTS segments')
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)",
+                                  (self.fingerprint,))
+            self.conn.execute('CREATE TABLE IF NOT EXISTS segments '
+                              '(word TEXT PRIMARY KEY, rules TEXT) WITHOUT ROWID')
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def get(self, word):
+        # Rule chain tuple, or None when the word is not stored
+        rules = self.pending.get(word)
+        if rules is None:
+            row = self.conn.execute('SELECT rules FROM segments WHERE word = ?', (word,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            rules = tuple(int(r) for r in row[0].split(',')) if row[0] else ()
+        self.hits += 1
+        return rules
+
+    def put(self, word, rules):
+        self.pending[word] = tuple(rules)
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.conn.execute('BEGIN IMMEDIATE')
+        rows = ((word, ','.join(map(str, rules))) for word, rules in self.pending.items())
+        self.conn.executemany('INSERT OR IGNORE INTO segments VALUES (?, ?)', rows)
+        self.conn.execute('COMMIT')
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM segments').fetchone()[0] + len(self.pending)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from enhanced_segmenter import VALIDATION_MODES, MalayalamMorphologicalSegmenter
+from hybrid_tokenizer import DEFAULT_MODEL, SEP_MODES, HybridTokenizer
+
+HOST = '127.0.0.1'
+PORT = 8765
+CORPUS_FILE = 'malayalam_raw_corpus.txt'
+
+# Micro-batching and backpressure defaults
+WINDOW_MS = 2
+MAX_BATCH = 256
+MAX_PENDING = 4096
+MAX_BODY = 1 << 20
+# Latency samples kept for percentiles
+LATENCY_WINDOW = 10000
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class Overloaded(Exception):
+    pass
+
+class MicroBatcher:
+    # Collects concurrent requests for window_ms and runs them as one batch in the pool
+    def __init__(self, fn, executor, window_ms=WINDOW_MS, max_batch=MAX_BATCH,
+                 max_pending=MAX_PENDING, concurrency=1):
+        self.fn = fn
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batches = 0
+        self.batch_items = 0
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(concurrency)
+
+    async def submit(self, items):
+        # Reject instead of queueing without bound
+        if self.pending + len(items) > self.max_pending:
+            raise Overloaded()
+        self.pending += len(items)
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((items, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            # Let concurrent requests arrive, then take what is queued
+            if size < self.max_batch and self.window > 0:
+                await asyncio.sleep(self.window)
+            while size < self.max_batch and not self.queue.empty():
+                request = self.queue.get_nowait()
+                batch.append(request)
+                size += len(request[0])
+            await self.slots.acquire()
+            loop.create_task(self._dispatch(loop, batch, size))
+
+    async def _dispatch(self, loop, batch, size):
+        try:
+            items = [item for request, _ in batch for item in request]
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            pos = 0
+            for request, future in batch:
+                # Clients may have gone away
+                if not future.done():
+                    future.set_result(results[pos:pos + len(request)])
+                pos += len(request)
+            self.batches += 1
+            self.batch_items += size
+        finally:
+            self.pending -= size
+            self.slots.release()
+
+class ServerMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.sentences = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def record(self, seconds, n_sentences):
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.sentences += n_sentences
+
+    def snapshot(self, batchers=()):
+        uptime = time.perf_counter() - self.started
+        lat = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies))
+        p50, p99 = (np.percentile(lat, [50, 99]) * 1000).tolist() if len(lat) else (0.0, 0.0)
+        stats = {
+            'uptime_seconds': uptime,
+            'requests': self.requests,
+            'sentences': self.sentences,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'requests_per_second': self.requests / uptime if uptime else 0.0,
+            'sentences_per_second': self.sentences / uptime if uptime else 0.0,
+            'latency_p50_ms': p50,
+            'latency_p99_ms': p99
+        }
+        for name, batcher in batchers:
+            stats[f'{name}_batches'] = batcher.batches
+            stats[f'{name}_mean_batch'] = batcher.batch_items / batcher.batches if batcher.batches else 0.0
+            stats[f'{name}_pending'] = batcher.pending
+        return stats
+
+async def read_message(reader):
+    # Minimal HTTP/1.1 framing: start line, headers, Content-Length body
+    start = await reader.readline()
+    if not start:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise ValueError(413)
+    body = await reader.readexactly(length) if length else b''
+    # Method, target and version, or the request is malformed
+    parts = start.decode('latin-1').rstrip('\r\n').split(' ', 2)
+    if len(parts) != 3:
+        raise ValueError(400)
+    return parts, headers, body
+
+def write_message(writer, start, payload, keep_alive=True):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"{start}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+
+class SegmentationServer:
+    # POST /segment, POST /encode, GET /metrics, GET /health
+    def __init__(self, model=DEFAULT_MODEL, sep_mode='keep', workers=4, window_ms=WINDOW_MS,
+                 max_batch=MAX_BATCH, max_pending=MAX_PENDING, validation='off', cache_path=None):
+        segmenter = MalayalamMorphologicalSegmenter(validation=validation, cache_path=cache_path)
+        self.hybrid = HybridTokenizer(model, segmenter=segmenter, sep_mode=sep_mode)
+        # Segmentation and mlmorph block, encode_batch releases the GIL
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.metrics = ServerMetrics()
+        options = dict(window_ms=window_ms, max_batch=max_batch,
+                       max_pending=max_pending, concurrency=workers)
+        self.batchers = {
+            'segment': MicroBatcher(self.hybrid.segment_batch, self.executor, **options),
+            'encode': MicroBatcher(self._encode, self.executor, **options)
+        }
+        self.tasks = []
+
+    def _encode(self, sentences):
+        return [{'ids': e.ids, 'tokens': e.tokens} for e in self.hybrid.encode_batch(sentences)]
+
+    async def start(self, host=HOST, port=PORT, unix_path=None):
+        self.tasks = [asyncio.create_task(b.run()) for b in self.batchers.values()]
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            return await asyncio.start_unix_server(self.handle, path=unix_path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False)
+        self.hybrid.segmenter.close()
+
+    async def _route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics.snapshot(self.batchers.items())
+        name = path.strip('/')
+        if method != 'POST' or name not in self.batchers:
+            return 404, {'error': f"no route for {method} {path}"}
+
+        # {"text": "..."} or {"sentences": [...]}
+        request = json.loads(body or b'{}')
+        sentences = request['sentences'] if 'sentences' in request else [request['text']]
+        if not isinstance(sentences, list) or not all(isinstance(s, str) for s in sentences):
+            return 400, {'error': 'sentences must be a list of strings'}
+        batcher = self.batchers[name]
+        # Would be rejected however idle the server is
+        if len(sentences) > batcher.max_pending:
+            return 413, {'error': f"at most {batcher.max_pending} sentences per request"}
+
+        start = time.perf_counter()
+        results = await batcher.submit(sentences)
+        self.metrics.record(time.perf_counter() - start, len(sentences))
+        return 200, {'segmented' if name == 'segment' else 'encodings': results}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except ValueError as e:
+                    status = e.args[0] if e.args and e.args[0] in REASONS else 400
+                    write_message(writer, f"HTTP/1.1 {status} {REASONS[status]}",
+                                  {'error': 'bad request'}, keep_alive=False)
+                    break
+                if message is None:
+                    break
+                (method, path, _), headers, body = message
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                try:
+                    status, payload = await self._route(method, path, body)
+                except Overloaded:
+                    self.metrics.rejected += 1
+                    status, payload = 503, {'error': 'overloaded, retry later'}
+                except (KeyError, TypeError, UnicodeDecodeError, json.JSONDecodeError) as e:
+                    status, payload = 400, {'error': f"bad request: {e}"}
+                except Exception as e:
+                    self.metrics.errors += 1
+                    status, payload = 500, {'error': str(e)}
+
+                write_message(writer, f"HTTP/1.1 {status} {REASONS[status]}", payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(args):
+    server = SegmentationServer(args.model, args.sep, args.workers, args.window_ms, args.max_batch,
+                                args.max_pending, args.validation, args.cache)
+    srv = await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"serving {args.model} on {where}")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.close()
+
+def load_sentences(path, limit=10000):
+    sentences = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    sentences.append(line)
+                if len(sentences) >= limit:
+                    break
+    return sentences or ["കേരളത്തിൽ കുട്ടികൾ പഠിക്കുന്നു.", "അവരുടെ വീട്ടിൽ നിന്ന് വന്നു."]
+
+async def _client(connect, jobs, results, endpoint):
+    # One keep-alive connection issuing requests back to back
+    reader, writer = await connect()
+    try:
+        while jobs:
+            payload = jobs.pop()
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            start = time.perf_counter()
+            writer.write((f"POST /{endpoint} HTTP/1.1\r\nHost: localhost\r\n"
+                          "Content-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+            await writer.drain()
+            (_, status, _), _, _ = await read_message(reader)
+            results.append((int(status), time.perf_counter() - start))
+    finally:
+        writer.close()
+
+async def _get(connect, path):
+    reader, writer = await connect()
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    _, _, body = await read_message(reader)
+    writer.close()
+    return json.loads(body)
+
+async def bench(args):
+    # Local load generator; starts an in-process server unless --connect/--unix is given
+    server = srv = None
+    if args.connect is None and args.unix is None:
+        server = SegmentationServer(args.model, args.sep, args.workers, args.window_ms,
+                                    args.max_batch, args.max_pending, args.validation, args.cache)
+        srv = await server.start(HOST, 0)
+        host, port = HOST, srv.sockets[0].getsockname()[1]
+    elif args.connect:
+        host, _, port = args.connect.rpartition(':')
+        port = int(port)
+
+    if args.unix and server is None:
+        connect = lambda: asyncio.open_unix_connection(args.unix)
+    else:
+        connect = lambda: asyncio.open_connection(host, port)
+
+    sentences = load_sentences(args.corpus)
+    jobs = [{'sentences': [sentences[(i * args.batch + j) % len(sentences)] for j in range(args.batch)]}
+            for i in range(args.requests)]
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(connect, jobs, results, args.endpoint)
+                           for _ in range(args.concurrency)))
+    seconds = time.perf_counter() - start
+
+    lat = np.array([s for _, s in results]) * 1000
+    ok = sum(1 for status, _ in results if status == 200)
+    report = {
+        'endpoint': args.endpoint,
+        'concurrency': args.concurrency,
+        'requests': len(results),
+        'ok': ok,
+        'rejected': sum(1 for status, _ in results if status == 503),
+        'seconds': seconds,
+        'requests_per_second': len(results) / seconds,
+        'sentences_per_second': ok * args.batch / seconds,
+        'latency_p50_ms': float(np.percentile(lat, 50)),
+        'latency_p99_ms': float(np.percentile(lat, 99)),
+        'server': await _get(connect, '/metrics')
+    }
+    if server is not None:
+        srv.close()
+        await srv.wait_closed()
+        server.close()
+    print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    serve_p = sub.add_parser('serve', help='run the HTTP service')
+    bench_p = sub.add_parser('bench', help='load-test a running or in-process server')
+    for p in (serve_p, bench_p):
+        p.add_argument('--model', default=DEFAULT_MODEL)
+        p.add_argument('--sep', default='keep', choices=SEP_MODES)
+        p.add_argument('--workers', type=int, default=4, help='executor threads')
+        p.add_argument('--window-ms', type=float, default=WINDOW_MS, help='batching window')
+        p.add_argument('--max-batch', type=int, default=MAX_BATCH, help='sentences per batch')
+        p.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                       help='queued sentences before answering 503 (and the most one request may send)')
+        p.add_argument('--validation', default='off', choices=VALIDATION_MODES)
+        p.add_argument('--cache', default=None, help='persistent segmentation cache (sqlite)')
+        p.add_argument('--unix', default=None, help='unix socket path')
+    serve_p.add_argument('--host', default=HOST)
+    serve_p.add_argument('--port', type=int, default=PORT)
+    bench_p.add_argument('--connect', default=None, help='host:port of a running server')
+    bench_p.add_argument('--endpoint', default='encode', choices=('segment', 'encode'))
+    bench_p.add_argument('--concurrency', type=int, default=32)
+    bench_p.add_argument('--requests', type=int, default=2000)
+    bench_p.add_argument('--batch', type=int, default=1, help='sentences per request')
+    bench_p.add_argument('--corpus', default=CORPUS_FILE)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args) if args.cmd == 'serve' else bench(args))
+    except KeyboardInterrupt:
+        pass
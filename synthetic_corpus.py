@@ -0,0 +1,172 @@
+import argparse
+import numpy as np
+from corpus_stream import open_output
+from enhanced_segmenter import MORPH_RULES, SuffixMatcher
+
+OUT_FILE = 'synthetic_corpus.txt'
+SEED = 13
+ZIPF_EXPONENT = 1.07
+# Share of vocabulary types that carry a rule suffix
+SUFFIX_RATE = 0.6
+# Surface forms per stem, on average
+FORMS_PER_STEM = 4
+SENTENCE_WORDS = (4, 16)
+BATCH_TOKENS = 1 << 20
+
+# Malayalam syllable pieces for stem generation
+# U+0D29 is archaic and left out
+CONSONANTS = [chr(c) for c in range(0x0D15, 0x0D3A) if c != 0x0D29]
+VOWELS = ['അ', 'ആ', 'ഇ', 'ഉ', 'എ', 'ഒ']
+VOWEL_SIGNS = ['', 'ാ', 'ി', 'ീ', 'ു', 'ൂ', 'െ', 'േ', 'ൊ', 'ോ']
+SIGN_WEIGHTS = [0.4, 0.12, 0.12, 0.04, 0.1, 0.04, 0.06, 0.06, 0.03, 0.03]
+VIRAMA = '്'
+# Dependent signs: a suffix starting with one attaches to a bare consonant
+SIGNS = set(VOWEL_SIGNS[1:]) | {VIRAMA, 'ൃ', 'ൗ'}
+
+def parse_size(text):
+    # '500M', '10G' -> bytes
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def make_stems(rng, n_stems):
+    # Distinct pseudo-Malayalam stems of 2-4 syllables
+    stems = set()
+    while len(stems) < n_stems:
+        n = n_stems - len(stems)
+        lengths = rng.integers(2, 5, size=n)
+        onsets = rng.random(size=n) < 0.15
+        cons = rng.integers(len(CONSONANTS), size=(n, 4))
+        signs = rng.choice(len(VOWEL_SIGNS), size=(n, 4), p=SIGN_WEIGHTS)
+        geminate = rng.random(size=(n, 4)) < 0.2
+        vowels = rng.integers(len(VOWELS), size=n)
+        for i in range(n):
+            parts = [VOWELS[vowels[i]]] if onsets[i] else []
+            for k in range(lengths[i]):
+                c = CONSONANTS[cons[i, k]]
+                # Doubled consonant, e.g. ക്ക
+                if geminate[i, k] and k > 0:
+                    c = c + VIRAMA + c
+                parts.append(c + VOWEL_SIGNS[signs[i, k]])
+            stems.add(''.join(parts))
+    return sorted(stems)
+
+def make_vocabulary(n_types, seed=SEED, suffix_rate=SUFFIX_RATE, forms_per_stem=FORMS_PER_STEM):
+    # n_types distinct words: stems alone or stem + MORPH_RULES suffix
+    # Returned in Zipf rank order (index 0 is the most frequent)
+    rng = np.random.default_rng(seed)
+    suffixes = SuffixMatcher(MORPH_RULES).suffixes
+    stems = make_stems(rng, max(1, n_types // forms_per_stem))
+
+    # Suffixes like ിൽ replace the stem's final vowel sign
+    bare = [s[:-1] if s[-1] in SIGNS else s for s in stems]
+    attach = [x[0] in SIGNS for x in suffixes]
+    
+    words = {}
+    while len(words) < n_types:
+        n = n_types - len(words)
+        stem_ids = rng.integers(len(stems), size=n)
+        has_suffix = rng.random(size=n) < suffix_rate
+        suffix_ids = rng.integers(len(suffixes), size=n)
+        for s, h, x in zip(stem_ids, has_suffix, suffix_ids):
+            if not h:
+                word = stems[s]
+            else:
+                word = (bare[s] if attach[x] else stems[s]) + suffixes[x]
+            words.setdefault(word, None)
+    vocab = np.array(list(words)[:n_types], dtype=object)
+    rng.shuffle(vocab)
+    return vocab
+
+def zipf_probs(n_types, exponent=ZIPF_EXPONENT):
+    p = 1.0 / np.arange(1, n_types + 1, dtype=np.float64) ** exponent
+    return p / p.sum()
+
+def expected_types(n_types, n_tokens, exponent=ZIPF_EXPONENT):
+    # Expected distinct words in n_tokens draws
+    p = zipf_probs(n_types, exponent)
+    return float(np.sum(-np.expm1(n_tokens * np.log1p(-p))))
+
+def vocab_size_for_ttr(ttr, n_tokens, exponent=ZIPF_EXPONENT, max_types=10_000_000):
+    # Smallest vocabulary whose expected type/token ratio reaches ttr
+    target = ttr * n_tokens
+    lo, hi = 1, max(1, min(max_types, n_tokens * 4))
+    if expected_types(hi, n_tokens, exponent) < target:
+        print(f"warning: ttr {ttr} is out of reach with exponent {exponent}, using {hi} types")
+        return hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if expected_types(mid, n_tokens, exponent) < target:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def iter_sentences(vocab, seed=SEED, exponent=ZIPF_EXPONENT, sentence_words=SENTENCE_WORDS,
+                   batch_tokens=BATCH_TOKENS):
+    # Endless stream of sentences, one batch of Zipf draws at a time
+    rng = np.random.default_rng(seed + 1)
+    cdf = np.cumsum(zipf_probs(len(vocab), exponent))
+    cdf[-1] = 1.0
+    lo, hi = sentence_words
+    while True:
+        words = vocab[np.searchsorted(cdf, rng.random(batch_tokens), side='right')]
+        lengths = rng.integers(lo, hi + 1, size=batch_tokens // lo)
+        ends = np.cumsum(lengths)
+        ends = ends[ends <= batch_tokens]
+        start = 0
+        for end in ends.tolist():
+            yield ' '.join(words[start:end]) + '.'
+            start = end
+
+def generate(out_file=OUT_FILE, n_tokens=None, size=None, n_types=None, ttr=None,
+             seed=SEED, exponent=ZIPF_EXPONENT):
+    # Stop after n_tokens words or size bytes, whichever comes first
+    if n_tokens is None and size is None:
+        raise ValueError("give n_tokens or size")
+    if n_types is None:
+        if ttr is None:
+            raise ValueError("give n_types or ttr")
+        if n_tokens is None:
+            raise ValueError("ttr needs n_tokens")
+        n_types = vocab_size_for_ttr(ttr, n_tokens, exponent)
+
+    vocab = make_vocabulary(n_types, seed)
+    print(f"vocabulary: {len(vocab)} types")
+
+    stats = {'lines': 0, 'tokens': 0, 'bytes': 0, 'types': len(vocab)}
+    with open_output(out_file) as f:
+        for line in iter_sentences(vocab, seed, exponent):
+            data = line + '\n'
+            f.write(data)
+            stats['lines'] += 1
+            stats['tokens'] += line.count(' ') + 1
+            stats['bytes'] += len(data.encode('utf-8'))
+            if (n_tokens is not None and stats['tokens'] >= n_tokens) or \
+               (size is not None and stats['bytes'] >= size):
+                break
+            if stats['lines'] % 1000000 == 0:
+                print(f"wrote {stats['lines']} lines / {stats['bytes'] / (1 << 20):.0f} MB")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default=OUT_FILE, help="'-' for stdout, .gz/.xz/.zst to compress")
+    parser.add_argument('--tokens', type=int, default=None, help='words to write')
+    parser.add_argument('--size', default=None, help='bytes to write, e.g. 500M or 10G')
+    parser.add_argument('--types', type=int, default=None, help='vocabulary size')
+    parser.add_argument('--ttr', type=float, default=None,
+                        help='target type/token ratio (sets --types from --tokens)')
+    parser.add_argument('--exponent', type=float, default=ZIPF_EXPONENT)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    if args.tokens is None and args.size is None:
+        args.tokens = 1000000
+    if args.types is None and args.ttr is None:
+        args.types = 100000
+    stats = generate(args.output, args.tokens, parse_size(args.size) if args.size else None,
+                     args.types, args.ttr, args.seed, args.exponent)
+    print(f"done. {stats['lines']} lines / {stats['tokens']} tokens / {stats['bytes']:,} bytes")
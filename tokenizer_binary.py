@@ -0,0 +1,203 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+from array import array
+
+# Import tokenizers library
+try:
+    from tokenizers import Tokenizer, models
+    HAS_HF = True
+except ImportError:
+    HAS_HF = False
+
+# Peak RSS is unavailable on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MODEL_DIR = "trained_tokenizers"
+BPE_MODELS = [f"bpe_{c}_{v}" for c in ("raw", "morphological") for v in (8000, 16000, 32000)]
+
+# Layout (little endian, sections 4-byte aligned):
+#   header   magic, version, n_tokens, n_merges, config bytes, string bytes, string chars
+#   config   JSON of everything except model vocab/merges
+#   offsets  uint32[n_tokens + 1], code point offsets into the string table
+#   strings  UTF-8 token strings in id order
+#   merges   uint32[2 * n_merges], (left id, right id) pairs
+MAGIC = b'MLTKBPE1'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIIII')
+
+# BPE model fields passed back to models.BPE
+BPE_PARAMS = ('dropout', 'unk_token', 'continuing_subword_prefix', 'end_of_word_suffix',
+              'fuse_unk', 'byte_fallback', 'ignore_merges')
+
+def _pad(n):
+    return (-n) % 4
+
+def export_binary(json_path, out_path):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    model = data['model']
+    if model.get('type') != 'BPE':
+        raise ValueError(f"not a BPE model: {json_path}")
+
+    # Tokens in id order; ids must be dense
+    vocab = model['vocab']
+    tokens = [None] * len(vocab)
+    for tok, i in vocab.items():
+        tokens[i] = tok
+    if None in tokens:
+        raise ValueError(f"vocab ids are not contiguous: {json_path}")
+
+    merges = array('I')
+    for m in model['merges']:
+        a, b = m if isinstance(m, list) else m.split(' ', 1)
+        merges.extend((vocab[a], vocab[b]))
+
+    offsets = array('I', [0])
+    for tok in tokens:
+        offsets.append(offsets[-1] + len(tok))
+    strings = ''.join(tokens).encode('utf-8')
+
+    # Config keeps an empty model so from_str can rebuild the pipeline
+    config = dict(data)
+    config['model'] = {k: v for k, v in model.items() if k not in ('vocab', 'merges')}
+    config = json.dumps(config, ensure_ascii=False).encode('utf-8')
+
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+        merges.byteswap()
+
+    with open(out_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(tokens), len(merges) // 2,
+                            len(config), len(strings), offsets[-1]))
+        for section in (config, offsets.tobytes(), strings):
+            f.write(section)
+            f.write(b'\0' * _pad(len(section)))
+        f.write(merges.tobytes())
+    return out_path
+
+def _uint32s(mm, pos, count):
+    # Little-endian uint32 section as a list
+    values = array('I')
+    values.frombytes(mm[pos:pos + 4 * count])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tolist()
+
+def read_binary(path):
+    # (config, tokens, merge id pairs) from an mmap'd file
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, n_tokens, n_merges, config_len, strings_len, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a tokenizer binary: {path}")
+
+        pos = HEADER.size
+        config = json.loads(mm[pos:pos + config_len])
+        pos += config_len + _pad(config_len)
+
+        offsets = _uint32s(mm, pos, n_tokens + 1)
+        pos += 4 * (n_tokens + 1)
+
+        # One decode, then slice by code point offsets
+        text = mm[pos:pos + strings_len].decode('utf-8')
+        pos += strings_len + _pad(strings_len)
+        tokens = [text[a:b] for a, b in zip(offsets, offsets[1:])]
+
+        ids = iter(_uint32s(mm, pos, 2 * n_merges))
+        merges = [(tokens[a], tokens[b]) for a, b in zip(ids, ids)]
+    finally:
+        mm.close()
+    return config, tokens, merges
+
+def load_binary(path):
+    if not HAS_HF:
+        raise ImportError("tokenizers not installed")
+    config, tokens, merges = read_binary(path)
+    model = config['model']
+
+    # Rebuild normalizer, pre-tokenizer and post-processor, then swap in the model
+    tok = Tokenizer.from_str(json.dumps(dict(config, model=dict(model, vocab={}, merges=[]))))
+    params = {k: model[k] for k in BPE_PARAMS if model.get(k) is not None}
+    tok.model = models.BPE(dict(zip(tokens, range(len(tokens)))), merges, **params)
+    return tok
+
+def _rss_kb():
+    # Current RSS on Linux, peak RSS elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+
+def _probe(method, path):
+    # Runs in a fresh interpreter: load once, report time and RSS growth
+    before = _rss_kb()
+    start = time.perf_counter()
+    tok = Tokenizer.from_file(path) if method == 'json' else load_binary(path)
+    seconds = time.perf_counter() - start
+    after = _rss_kb()
+    print(json.dumps({'seconds': seconds, 'rss_kb': after - before, 'vocab': tok.get_vocab_size()}))
+
+def benchmark(model_dir=MODEL_DIR, names=BPE_MODELS):
+    # Cold-start load time and RSS, JSON vs binary
+    results = {}
+    for name in names:
+        json_path = os.path.join(model_dir, f"{name}.json")
+        bin_path = os.path.join(model_dir, f"{name}.mltk")
+        if not os.path.exists(json_path):
+            print(f"File not found: {json_path}")
+            continue
+        if not os.path.exists(bin_path):
+            export_binary(json_path, bin_path)
+
+        row = {'json_bytes': os.path.getsize(json_path), 'binary_bytes': os.path.getsize(bin_path)}
+        for method, path in (('json', json_path), ('binary', bin_path)):
+            out = subprocess.run([sys.executable, __file__, 'probe', method, path],
+                                 capture_output=True, text=True, check=True)
+            probe = json.loads(out.stdout.strip().splitlines()[-1])
+            row[f'{method}_ms'] = round(probe['seconds'] * 1000, 2)
+            row[f'{method}_rss_kb'] = probe['rss_kb']
+        results[name] = row
+        print(f"{name}: json {row['json_ms']} ms / {row['json_rss_kb']} KB | "
+              f"binary {row['binary_ms']} ms / {row['binary_rss_kb']} KB")
+    return results
+
+def check_equivalent(json_path, bin_path, texts):
+    a = Tokenizer.from_file(json_path)
+    b = load_binary(bin_path)
+    for enc_a, enc_b in zip(a.encode_batch(texts), b.encode_batch(texts)):
+        if enc_a.ids != enc_b.ids or enc_a.tokens != enc_b.tokens:
+            return False
+    return a.get_vocab() == b.get_vocab()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    exp = sub.add_parser('export', help='write .mltk files next to the BPE JSON models')
+    exp.add_argument('--dir', default=MODEL_DIR)
+    sub.add_parser('bench', help='compare load time and RSS against the JSON path')
+    probe = sub.add_parser('probe')
+    probe.add_argument('method')
+    probe.add_argument('path')
+    args = parser.parse_args()
+
+    if args.cmd == 'export':
+        for name in BPE_MODELS:
+            json_path = os.path.join(args.dir, f"{name}.json")
+            if os.path.exists(json_path):
+                out = export_binary(json_path, os.path.join(args.dir, f"{name}.mltk"))
+                print(f"saved to {out}")
+    elif args.cmd == 'bench':
+        print(json.dumps(benchmark(), indent=2))
+    else:
+        _probe(args.method, args.path)
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from pathlib import PureWindowsPath
+
+# Import tokenizers library
+try:
+    from tokenizers import Tokenizer
+    HAS_HF = True
+except ImportError:
+    HAS_HF = False
+
+# Import SentencePiece library
+try:
+    import sentencepiece as spm
+    HAS_SP = True
+except ImportError:
+    HAS_SP = False
+
+MODEL_DIR = "trained_tokenizers"
+SUMMARY_PATH = os.path.join(MODEL_DIR, "training_summary.json")
+
+# Process-wide caches, shared by every script in a session
+_models = {}
+_metrics = {}
+_locks = {}
+_lock = threading.Lock()
+
+def normalize_path(path):
+    # Summaries written on Windows use backslashes
+    if '\\' in path:
+        path = PureWindowsPath(path).as_posix()
+    return os.path.normpath(path)
+
+def model_name(path):
+    # trained_tokenizers/bpe_raw_8000.json -> bpe_raw_8000
+    return os.path.splitext(os.path.basename(normalize_path(path)))[0]
+
+def model_kind(path):
+    return 'bpe' if path.endswith(('.json', '.mltk')) else 'sentencepiece'
+
+def discover(summary_path=SUMMARY_PATH):
+    # name -> path, from the training summary plus a directory scan
+    model_dir = os.path.dirname(summary_path) or '.'
+    found = {}
+
+    if os.path.exists(summary_path):
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        for paths in summary.get('models', {}).values():
+            for path in paths:
+                path = normalize_path(path)
+                # Paths are stored relative to the repo root
+                if not os.path.exists(path):
+                    path = os.path.join(model_dir, os.path.basename(path))
+                found[model_name(path)] = path
+
+    # Pick up models missing from the summary
+    if os.path.isdir(model_dir):
+        for fname in sorted(os.listdir(model_dir)):
+            if fname.startswith(('bpe_', 'sp_')) and fname.endswith(('.json', '.model')):
+                found.setdefault(model_name(fname), os.path.join(model_dir, fname))
+    return found
+
+def _read_model(path):
+    if path.endswith('.mltk'):
+        from tokenizer_binary import load_binary
+        return load_binary(path)
+    if model_kind(path) == 'bpe':
+        if not HAS_HF:
+            raise ImportError("tokenizers not installed")
+        return Tokenizer.from_file(path)
+    if not HAS_SP:
+        raise ImportError("sentencepiece not installed")
+    return spm.SentencePieceProcessor(model_file=path)
+
+def load_path(path):
+    # Load a model file once per process
+    key = os.path.realpath(normalize_path(path))
+    model = _models.get(key)
+    if model is not None:
+        _metrics[key]['hits'] += 1
+        return model
+
+    with _lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _models:
+            start = time.perf_counter()
+            model = _read_model(key)
+            _metrics[key] = {
+                'name': model_name(key),
+                'load_seconds': time.perf_counter() - start,
+                'bytes': os.path.getsize(key),
+                'hits': 0
+            }
+            _models[key] = model
+        else:
+            _metrics[key]['hits'] += 1
+    return _models[key]
+
+def load(name, summary_path=SUMMARY_PATH):
+    # Load by name, e.g. 'bpe_morphological_16000'
+    paths = discover(summary_path)
+    if name not in paths:
+        raise KeyError(f"unknown tokenizer: {name}")
+    return load_path(paths[name])
+
+def load_metrics():
+    return {m['name']: dict(m) for m in _metrics.values()}
+
+def clear():
+    with _lock:
+        _models.clear()
+        _metrics.clear()
+        _locks.clear()
+
+if __name__ == "__main__":
+    # List and load every model
+    for name, path in discover().items():
+        try:
+            load_path(path)
+            m = _metrics[os.path.realpath(path)]
+            print(f"{name}: {m['load_seconds'] * 1000:.1f} ms ({m['bytes'] / 1024:.0f} KB)")
+        except Exception as e:
+            print(f"{name}: error loading {path}: {e}")
@@ -2,9 +2,123 @@
 import json
 import os
 import re
-from tokenizers import Tokenizer
-import sentencepiece as spm
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
+import tokenizer_registry
+from corpus_filter import iter_range_blocks, shard_offsets
+
+# Morpheme boundary written by the processor
+SEP = '_SEP_'
+# Punctuation stuck to a whitespace token, e.g. the '.' in 'ുന്നു.'
+EDGE_PUNCT_RE = re.compile(r'^[^\w\u0D00-\u0D7F]+|[^\w\u0D00-\u0D7F]+$')
+
+def _grow(counts, size):
+    if len(counts) < size:
+        counts = np.concatenate([counts, np.zeros(size - len(counts), dtype=np.int64)])
+    return counts
+
+def _shard_type_counts(task):
+    # Interned word types and NumPy counts for one byte range
+    path, start, end = task
+    table = {}
+    intern = table.setdefault
+    counts = np.zeros(0, dtype=np.int64)
+    lengths = []
+    with open(path, 'rb') as f:
+        for lines in iter_range_blocks(f, start, end):
+            ids = []
+            for line in lines:
+                tokens = line.split()
+                lengths.append(len(tokens))
+                ids.extend([intern(t, len(table)) for t in tokens])
+            counts = _grow(counts, len(table))
+            counts += np.bincount(np.array(ids, dtype=np.int64), minlength=len(table))
+    return list(table), counts, np.bincount(np.array(lengths, dtype=np.int64))
+
+def merge_type_counts(parts):
+    # Union of shard id tables; ids are unique within a shard
+    table = {}
+    intern = table.setdefault
+    counts = np.zeros(0, dtype=np.int64)
+    line_lengths = np.zeros(0, dtype=np.int64)
+    for words, part_counts, part_lengths in parts:
+        ids = np.fromiter((intern(w, len(table)) for w in words), dtype=np.int64, count=len(words))
+        counts = _grow(counts, len(table))
+        counts[ids] += part_counts
+        line_lengths = _grow(line_lengths, len(part_lengths))
+        line_lengths[:len(part_lengths)] += part_lengths
+    return list(table), counts, line_lengths
+
+def morpheme_counts(words, counts):
+    # Split each type on _SEP_ once; frequency-weighted counts as a suffix
+    table = {}
+    intern = table.setdefault
+    morph_ids, owners, suffix = [], [], []
+    for i, word in enumerate(words):
+        for k, part in enumerate(word.split(SEP)):
+            part = EDGE_PUNCT_RE.sub('', part) or part
+            morph_ids.append(intern(part, len(table)))
+            owners.append(i)
+            suffix.append(k > 0)
+    morph_ids = np.array(morph_ids, dtype=np.int64)
+    weights = counts[np.array(owners, dtype=np.int64)]
+    suffix = np.array(suffix, dtype=bool)
+    suffixes = np.bincount(morph_ids[suffix], weights=weights[suffix], minlength=len(table)).astype(np.int64)
+    return list(table), suffixes
+
+def analyze_morph_data(path, workers=None):
+    # One parallel pass over the full hybrid corpus
+    workers = workers or os.cpu_count() or 1
+    tasks = [(path, a, b) for a, b in shard_offsets(path, workers * 4)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_shard_type_counts, tasks))
+    else:
+        parts = [_shard_type_counts(task) for task in tasks]
+    words, counts, line_lengths = merge_type_counts(parts)
+    
+    # Tokens with at least one boundary
+    n_parts = np.fromiter((w.count(SEP) + 1 for w in words), dtype=np.int64, count=len(words))
+    morphemes, suffix_totals = morpheme_counts(words, counts)
+    top = np.argsort(-suffix_totals, kind='stable')[:10]
+    
+    return {
+        'lines': int(line_lengths.sum()),
+        'tokens': int(counts.sum()),
+        'word_types': len(words),
+        'segmented_tokens': int(counts[n_parts > 1].sum()),
+        'morphemes': int(n_parts @ counts),
+        'morpheme_types': len(morphemes),
+        'top_suffixes': [(morphemes[i], int(suffix_totals[i])) for i in top if suffix_totals[i] > 0]
+    }
+
+def evaluate_model(model, type_words, type_freqs):
+    tokenizer = tokenizer_registry.load_path(model['path'])
+    
+    # encode() adds [CLS]/[SEP]; count them without building them
+    post = tokenizer.post_processor
+    n_special = post.num_special_tokens_to_add(False) if post is not None else 0
+    encodings = tokenizer.encode_batch(type_words, add_special_tokens=False)
+    
+    # Calculate fertility score
+    lengths = np.fromiter((len(e.tokens) for e in encodings), dtype=np.int64, count=len(encodings))
+    lengths += n_special
+    # Detect UNK tokens
+    has_unk = np.fromiter(('[UNK]' in e.tokens for e in encodings), dtype=bool, count=len(encodings))
+    
+    # Frequency-weighted reductions
+    n_words = int(type_freqs.sum())
+    avg_fertility = np.float64(int(lengths @ type_freqs)) / n_words
+    oov_rate = (int(type_freqs[has_unk].sum()) / n_words) * 100
+    # Calculate coverage percentage
+    coverage = 100 - oov_rate
+    
+    return {
+        "fertility": avg_fertility,
+        "oov_rate": oov_rate,
+        "coverage": coverage
+    }
 
 def calculate_metrics():
     print("Starting metrics verification...")
@@ -38,116 +152,60 @@ def calculate_metrics():
         {"name": "Hybrid 32k", "path": "trained_tokenizers/bpe_morphological_32000.json", "type": "bpe", "vocab": 32000},
     ]
 
-    results = {}
+    # Deduplicate words into a type table
+    type_counts = Counter(word for s in sample_sentences for word in s.split())
+    type_words = list(type_counts)
+    type_freqs = np.fromiter(type_counts.values(), dtype=np.int64, count=len(type_counts))
+    print(f"Unique word types in sample: {len(type_words)}")
 
+    # Evaluate models in parallel
+    results = {}
+    available = [m for m in models if os.path.exists(m['path'])]
     for model in models:
-        print(f"Evaluating {model['name']}...")
-        fertility_scores = []
-        oov_count = 0
-        total_subwords = 0
-        
-        if not os.path.exists(model['path']):
+        if model not in available:
             print(f"Model not found: {model['path']}")
-            continue
-
-        try:
-            tokenizer = Tokenizer.from_file(model['path'])
-            
-            for sentence in sample_sentences:
-                # Pre-tokenize for fertility
-                words = sentence.split()
-                for word in words:
-                    encoded = tokenizer.encode(word)
-                    tokens = encoded.tokens
-                    ids = encoded.ids
-                    
-                    # Calculate fertility score
-                    fertility_scores.append(len(tokens))
-                    total_subwords += len(tokens)
-                    
-                    # Check for unknown tokens
-                    # Detect UNK tokens
-                    if '[UNK]' in tokens:
-                        oov_count += 1
-            
-            avg_fertility = np.mean(fertility_scores)
-            oov_rate = (oov_count / len(fertility_scores)) * 100
-            # Calculate coverage percentage
-            coverage = 100 - oov_rate
-            
-            results[model['name']] = {
-                "fertility": avg_fertility,
-                "oov_rate": oov_rate,
-                "coverage": coverage
-            }
-            
-        except Exception as e:
-            print(f"Error evaluating {model['name']}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, len(available))) as pool:
+        futures = [(model, pool.submit(evaluate_model, model, type_words, type_freqs))
+                   for model in available]
+        for model, future in futures:
+            print(f"Evaluating {model['name']}...")
+            try:
+                results[model['name']] = future.result()
+            except Exception as e:
+                print(f"Error evaluating {model['name']}: {e}")
 
     print("\n--- Tokenization Metrics Results ---")
     print(json.dumps(results, indent=2))
 
     # Analyze morphological statistics
-    # Infer morpheme counts
-    # Parse space-separated tokens
     print("\nAnalyzing Morphological Statistics...")
     morph_data_path = "enhanced_hybrid_training_data.txt"
-    
-    morpheme_counts = {}
-    total_segmented_tokens_count = 0
-    total_morphemes_count = 0
-    
-    # Read data subset
-    # Limit to 100k lines
     try:
-        with open(morph_data_path, "r", encoding="utf-8") as f:
-            for i, line in enumerate(f):
-                if i >= 100000: break 
-                tokens = line.strip().split()
-                for token in tokens:
-                    # Process hybrid tokens
-                    # Handle pre-segmented words
-                    # Identify morpheme boundaries
-                    # Read processor output
-                    # Assume BPE-ready format
-                    # Example segmentation
-                    
-                    morpheme_counts[token] = morpheme_counts.get(token, 0) + 1
-                    total_morphemes_count += 1
-                
-                # Estimate original counts
-                # Count unique types
+        morph = analyze_morph_data(morph_data_path)
     except Exception as e:
         print(f"Error reading morph data: {e}")
-
-    print(f"Analyzed {i} lines of morphological data.")
-    print(f"Total Morphemes Counted: {total_morphemes_count}")
-    print(f"Unique Morpheme Types: {len(morpheme_counts)}")
+        return
     
-    # Estimate morpheme average
-    # Reference corpus stats
-    # Assume segmented content
-    # Check segmentation extent
-    # Verify hybrid format
+    n_lines = morph['lines']
+    print(f"Analyzed {n_lines} lines of morphological data.")
+    print(f"Total Word Tokens: {morph['tokens']} ({morph['word_types']} types)")
+    seg_pct = morph['segmented_tokens'] / morph['tokens'] * 100 if morph['tokens'] else 0
+    print(f"Segmented Word Tokens: {morph['segmented_tokens']} ({seg_pct:.1f}%)")
+    print(f"Total Morphemes Counted: {morph['morphemes']}")
+    print(f"Unique Morpheme Types: {morph['morpheme_types']}")
+    print("Top suffixes: " + ", ".join(f"{s} ({c})" for s, c in morph['top_suffixes']))
     
     # Compare token counts
     raw_tokens_per_line = total_word_tokens / len(sample_sentences)
     print(f"Avg Raw Tokens per Line: {raw_tokens_per_line}")
-    
-    # Read hybrid tokens
-    hybrid_tokens_count = 0
-    hybrid_lines_count = 0
-    with open(morph_data_path, "r", encoding="utf-8") as f:
-        for i, line in enumerate(f):
-            if i >= 10000: break
-            hybrid_tokens_count += len(line.split())
-            hybrid_lines_count += 1
-            
-    hybrid_tokens_per_line = hybrid_tokens_count / hybrid_lines_count
+    hybrid_tokens_per_line = morph['tokens'] / n_lines if n_lines else 0
     print(f"Avg Hybrid Tokens per Line: {hybrid_tokens_per_line}")
+    print(f"Avg Morphemes per Line: {morph['morphemes'] / n_lines if n_lines else 0}")
     
-    estimated_morphemes_per_word = hybrid_tokens_per_line / raw_tokens_per_line
-    print(f"Estimated Morphemes per Word (Global Fertility): {estimated_morphemes_per_word}")
+    # Morphemes per word from the _SEP_ boundaries
+    fertility = morph['morphemes'] / morph['tokens'] if morph['tokens'] else 0
+    print(f"Morphemes per Word (Global Fertility): {fertility}")
 
 if __name__ == "__main__":
     calculate_metrics()